@@ -1,23 +1,21 @@
-import utm
 import math
-from BayernAtlas.utils import download_file
+from BayernAtlas.utils import assemble_mosaic, download_files, read_xyz_tiles
+from BayernAtlas.tile_cache import TileCache
 # from .utils import download_file
 import numpy as np
+import shapely
 from landlab import RasterModelGrid
-import zipfile
 import os
 from CoordinateConversion.utils import latlon_to_utm
 
 class BayernAtlas:
-    def __init__(self, min_lat, min_long, max_lat, max_long):
+    def __init__(self, min_lat, min_long, max_lat, max_long, tile_cache=None):
         self.min_lat = min_lat
         self.min_long = min_long
         self.max_lat = max_lat
         self.max_long = max_long
-
-    def unpack_zip(self, zip_file, extract_to):
-        with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-            zip_ref.extractall(extract_to)
+        # Parsed tiles are kept as binary rasters so that later runs do not parse the XYZ text again
+        self.tile_cache = tile_cache if tile_cache is not None else TileCache()
 
     def get_utm32_coordinates(self):
         u_min_x, u_min_y = latlon_to_utm((self.min_lat, self.min_long))
@@ -29,49 +27,88 @@ class BayernAtlas:
 
         return utm32_min_x, utm32_max_x, utm32_min_y, utm32_max_y
 
-    def fetch_data(self):
-        utm32_min_x, utm32_max_x, utm32_min_y, utm32_max_y = self.get_utm32_coordinates()
+    def get_utm32_window(self, roi=None, tile_size=1000):
+        # Edges (left, right, bottom, top) in UTM meters of the cells to load. Without a region of interest these
+        # are the edges of all tiles touched by the bounding box, otherwise the cells covering the bounds of roi,
+        # which is either a (min_x, min_y, max_x, max_y) tuple in UTM or a shapely geometry.
+        if roi is None:
+            utm32_min_x, utm32_max_x, utm32_min_y, utm32_max_y = self.get_utm32_coordinates()
+            return utm32_min_x * tile_size, (utm32_max_x + 1) * tile_size, utm32_min_y * tile_size, (utm32_max_y + 1) * tile_size
+        min_x, min_y, max_x, max_y = roi.bounds if hasattr(roi, "bounds") else roi
+        return math.floor(min_x), math.ceil(max_x), math.floor(min_y), math.ceil(max_y)
+
+    def get_tiles(self, roi=None, tile_size=1000):
+        # (x, y) kilometer indices of all tiles overlapping the window
+        left, right, bottom, top = self.get_utm32_window(roi=roi, tile_size=tile_size)
+        return [(lat, long) for lat in range(left // tile_size, (right - 1) // tile_size + 1)
+                for long in range(bottom // tile_size, (top - 1) // tile_size + 1)]
+
+    def fetch_data(self, output_directory="./downloads", max_workers=8, roi=None, tile_size=1000):
+        # Download every tile compute_raster_model_grid reads for the same region of interest
+        downloads = []
+        for lat, long in self.get_tiles(roi=roi, tile_size=tile_size):
+            filename = str(lat) + "_" + str(long) + ".zip"
+            url = "https://download1.bayernwolke.de/a/dgm/dgm1xyz/" + filename
+            downloads.append((url, filename))
 
-        output_directory = "./downloads"
+        # Tiles are fetched concurrently over one pooled session
+        return download_files(downloads, output_directory, max_workers=max_workers)
 
-        for lat in range(utm32_min_x, utm32_max_x + 1):
-            for long in range(utm32_min_y, utm32_max_y + 1):
-                filename = str(lat) + "_" + str(long) + ".zip"
-                url = "https://download1.bayernwolke.de/a/dgm/dgm1xyz/" + filename
-                download_file(url, output_directory, filename)
+    def compute_raster_model_grid(self, processes=1, nodata_value=-9999.0, tile_size=1000, use_cache=True, roi=None, outside_roi_value=np.inf):
+        # The layout of the raster is known from the tile extents: 1 m spacing on a 1 km tile grid.
+        # With a region of interest only its window is read from each tile.
+        spacing = 1
+        left, right, bottom, top = self.get_utm32_window(roi=roi, tile_size=tile_size)
+        shape = (top - bottom, right - left)
+        mosaic = np.full(shape, nodata_value, dtype=float)
 
-    def compute_raster_model_grid(self):
-        utm32_min_x, utm32_max_x, utm32_min_y, utm32_max_y = self.get_utm32_coordinates()
-        dtm_files = []
-        for lat in range(utm32_min_x, utm32_max_x + 1):
-            for long in range(utm32_min_y, utm32_max_y + 1):
-                archive_file = str(lat) + "_" + str(long) + ".zip"
-                self.unpack_zip("./data/" + archive_file, "./data")
-                filename = str(lat) + "_" + str(long) + ".txt"
-                dtm_files.append("./data/" + filename)
-        # Initialize variables to store combined data
-        combined_x = []
-        combined_y = []
-        combined_elev = []
+        def place_tile(lat, long, raster):
+            tile_left, tile_top = lat * tile_size, (long + 1) * tile_size
+            x0, x1 = max(left, tile_left), min(right, tile_left + tile_size)
+            y0, y1 = max(bottom, tile_top - tile_size), min(top, tile_top)
+            window = raster[tile_top - y1:tile_top - y0, x0 - tile_left:x1 - tile_left]
+            # The cache stores float32, rounding restores the centimeter values of the XYZ files exactly
+            mosaic[top - y1:top - y0, x0 - left:x1 - left] = np.round(np.asarray(window, dtype=float), 2)
 
-        # Read data from each text file and combine it
-        for dtm_file in dtm_files:
-            x, y, elev = np.loadtxt(dtm_file, unpack=True)
-            combined_x.extend(x)
-            combined_y.extend(y)
-            combined_elev.extend(elev)
+        tiles_to_parse = []
+        for lat, long in self.get_tiles(roi=roi, tile_size=tile_size):
+            tile_id = str(lat) + "_" + str(long)
+            archive_file = "./data/" + tile_id + ".zip"
+            if not os.path.exists(archive_file):
+                print(f"Tile {archive_file} is missing, download the tiles of this region with fetch_data(roi=roi)")
+                continue
+            raster = self.tile_cache.get(tile_id, source_path=archive_file) if use_cache else None
+            if raster is not None and raster.shape == (tile_size, tile_size):
+                place_tile(lat, long, raster)
+            else:
+                tiles_to_parse.append((lat, long, tile_id, archive_file))
 
-        # Create a grid using Landlab with the combined data
-        spacing = np.mean(np.diff(combined_x))  # Assuming uniform spacing
-        spacing = 1 # I think we already know the spacing here, but we might double chack this
-        grid = RasterModelGrid(shape=(len(np.unique(combined_y)), len(np.unique(combined_x))), xy_spacing=spacing)
+        # Read the remaining tiles directly from their archives (optionally in parallel worker processes)
+        tiles = read_xyz_tiles([archive_file for _, _, _, archive_file in tiles_to_parse], processes=processes)
+        for (lat, long, tile_id, archive_file), xyz in zip(tiles_to_parse, tiles):
+            left_upper_x = lat * tile_size + 0.5 * spacing
+            left_upper_y = (long + 1) * tile_size - 0.5 * spacing
+            raster = assemble_mosaic([xyz], left_upper_x, left_upper_y, (tile_size, tile_size), nodata_value=nodata_value, spacing=spacing)
+            if use_cache:
+                self.tile_cache.put(tile_id, raster, source_path=archive_file)
+            place_tile(lat, long, raster)
 
-        # Sort the combined data by x and y coordinates
-        sorted_indices = np.lexsort((combined_x, -np.array(combined_y)))
-        combined_x = np.array(combined_x)[sorted_indices]
-        combined_y = np.array(combined_y)[sorted_indices]
-        combined_elev = np.array(combined_elev)[sorted_indices]
-        grid.at_node["topographic__elevation"] = np.array(combined_elev).reshape(grid.shape)
+        # Cells without elevation (missing tiles or points) and, with a polygon as region of interest, cells whose
+        # center lies outside of it are raised to outside_roi_value. The default of infinity makes them walls which
+        # are never flooded and carry no sandbag cost, instead of low terrain at nodata_value.
+        outside = mosaic == nodata_value
+        if np.any(outside):
+            print(f"{np.count_nonzero(outside)} cells have no elevation data, they are set to {outside_roi_value}")
+        if hasattr(roi, "bounds"):
+            cell_x = left + 0.5 * spacing + np.arange(shape[1]) * spacing
+            cell_y = top - 0.5 * spacing - np.arange(shape[0]) * spacing
+            outside |= ~shapely.contains_xy(roi, cell_x[np.newaxis, :], cell_y[:, np.newaxis])
+        mosaic[outside] = outside_roi_value
+
+        # Create a grid using Landlab, node 0 is the upper left cell
+        grid = RasterModelGrid(shape=shape, xy_spacing=spacing)
+        grid.at_node["topographic__elevation"] = mosaic.reshape(-1)
+        grid.left_upper_edge_utm = (left + 0.5 * spacing, top - 0.5 * spacing)
         
         # try:
         #     #TODO: This is now hardcoded for Straubing. It definitely needs to be fixed
@@ -79,9 +116,5 @@ class BayernAtlas:
         # except Exception as error:
         #     print("an error has occurred")
 
-        #delete all txt files in dtm_files to save disc space
-        for file in dtm_files:
-            os.remove(file)
-
         return grid
             
\ No newline at end of file
@@ -0,0 +1,71 @@
+import os
+import numpy as np
+from utils.file_cache import FileCache
+
+
+class TileCache(FileCache):
+    """
+    Local cache of parsed DGM tiles. Every tile is stored once as a compact .npy raster
+    (float32 by default) next to a .json sidecar holding its metadata. Later runs memory-map
+    the .npy instead of parsing the ASCII XYZ text again. Eviction works as in FileCache.
+    """
+    data_suffix = ".npy"
+    entry_name = "tile"
+    store_checksum = True
+
+    def __init__(self, cache_dir="./data/tile_cache", max_bytes=2 * 1024**3, dtype=np.float32):
+        super().__init__(cache_dir, max_bytes)
+        self.dtype = np.dtype(dtype)
+
+    @staticmethod
+    def _source_signature(source_path):
+        stat = os.stat(source_path)
+        return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+    def get(self, tile_id, source_path=None, verify_checksum=False):
+        """
+        Return the cached raster of tile_id as a read-only memmap, or None on a cache miss.
+
+        A tile is only served if its file size, shape and dtype match the sidecar and, when
+        source_path is given, the source archive did not change since the tile was cached.
+        With verify_checksum the SHA-256 of the .npy file is checked as well. Entries failing
+        a check are removed.
+        """
+        metadata = self._lookup(tile_id)
+        if metadata is None:
+            return None
+        data_path, _ = self._paths(tile_id)
+
+        valid = True
+        if source_path is not None:
+            valid = self._source_signature(source_path) == {
+                "source_size": metadata["source_size"],
+                "source_mtime_ns": metadata["source_mtime_ns"],
+            }
+        if valid and verify_checksum:
+            valid = self._checksum(data_path) == metadata["sha256"]
+        if valid:
+            try:
+                raster = np.load(data_path, mmap_mode="r")
+            except ValueError:
+                raster = None
+            valid = raster is not None and list(raster.shape) == metadata["shape"] and raster.dtype.str == metadata["dtype"]
+        if not valid:
+            self.discard(tile_id)
+            return None
+
+        self._touch(tile_id, metadata)
+        return raster
+
+    def put(self, tile_id, raster, source_path=None):
+        """
+        Store raster under tile_id and evict least recently used tiles above max_bytes.
+        """
+        raster = np.ascontiguousarray(raster, dtype=self.dtype)
+        metadata = {"tile_id": tile_id, "shape": list(raster.shape), "dtype": raster.dtype.str}
+        if source_path is not None:
+            metadata.update(self._source_signature(source_path))
+        else:
+            metadata.update({"source_size": None, "source_mtime_ns": None})
+        data_path = self._store(tile_id, lambda f: np.save(f, raster), metadata)
+        return np.load(data_path, mmap_mode="r")
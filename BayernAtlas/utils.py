@@ -1,23 +1,139 @@
+import io
 import os
+import time
+import zipfile
+import numpy as np
 import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 
-def download_file(url, output_dir, filename):
+# Status codes which are worth another attempt (rate limiting and server side hiccups)
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+def create_session(pool_size=8):
+    # One session shared by all workers so TCP/TLS connections to the server are reused
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _stream_to_partial_file(session, url, partial_path, chunk_size, timeout):
+    # Resume from whatever an earlier attempt (or run) already wrote to the .part file
+    offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:
+            # The requested range starts at the end of the file, i.e. the partial file is already complete
+            content_range = response.headers.get("Content-Range", "")
+            total = content_range.rsplit("/", 1)[-1]
+            if total.isdigit() and int(total) == offset:
+                return response.status_code
+            os.remove(partial_path)
+            raise requests.ConnectionError(f"Invalid partial file for {url}, restarting download")
+        if response.status_code not in (200, 206):
+            return response.status_code
+
+        # A server ignoring the Range header answers with 200 and the full body
+        mode = "ab" if response.status_code == 206 else "wb"
+        with open(partial_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+
+        expected_length = response.headers.get("Content-Length")
+        if expected_length is not None:
+            written = os.path.getsize(partial_path) - (offset if mode == "ab" else 0)
+            if written < int(expected_length):
+                raise requests.exceptions.ChunkedEncodingError(f"Connection closed early while downloading {url}")
+        return 200
+
+
+def download_file(url, output_dir, filename, session=None, retries=3, backoff=1.0, chunk_size=1 << 20, timeout=60):
     # Ensure the output directory exists
     os.makedirs(output_dir, exist_ok=True)
 
     # Build the full path for the output file
     output_path = os.path.join(output_dir, filename)
+    partial_path = output_path + ".part"
 
     if os.path.exists(output_path):
         print(f"Zip file already exists at: {output_path}")
-    else:
-        # Fetch the file from the URL
-        response = requests.get(url)
+        return output_path
+
+    if session is None:
+        session = create_session(pool_size=1)
 
-        if response.status_code == 200:
-            # Write the content to the output file
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
+    for attempt in range(retries + 1):
+        try:
+            status_code = _stream_to_partial_file(session, url, partial_path, chunk_size, timeout)
+        except TRANSIENT_EXCEPTIONS as error:
+            status_code = None
+            print(f"Download of {url} interrupted ({error}), attempt {attempt + 1} of {retries + 1}")
+
+        if status_code in (200, 416):
+            # Only a complete file ever appears under the final name
+            os.replace(partial_path, output_path)
             print(f"File downloaded successfully to: {output_path}")
-        else:
-            print("Failed to download the file. Status code:", response.status_code)
+            return output_path
+        if status_code is not None and status_code not in TRANSIENT_STATUS_CODES:
+            break
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+
+    print("Failed to download the file. Status code:", status_code)
+    return None
+
+
+def download_files(downloads, output_dir, max_workers=8, **kwargs):
+    # downloads is a list of (url, filename) tuples, returns a dict filename -> path (None if the download failed)
+    session = create_session(pool_size=max_workers)
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(download_file, url, output_dir, filename, session=session, **kwargs): filename
+                for url, filename in downloads
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    finally:
+        session.close()
+    return results
+
+
+def read_xyz_from_zip(zip_path):
+    # Parse the XYZ member of a DGM tile archive straight out of the zip, nothing is extracted to disk
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = [name for name in zip_ref.namelist() if name.lower().endswith((".txt", ".xyz"))]
+        if len(members) != 1:
+            raise ValueError(f"Expected exactly one XYZ file in {zip_path}, found {members}")
+        with zip_ref.open(members[0]) as raw:
+            x, y, elev = np.loadtxt(io.TextIOWrapper(raw, encoding="ascii"), unpack=True)
+    return x, y, elev
+
+
+def read_xyz_tiles(zip_paths, processes=1):
+    # Yields the (x, y, elev) arrays of every archive in the order of zip_paths
+    if processes is None or processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            yield from executor.map(read_xyz_from_zip, zip_paths)
+    else:
+        for zip_path in zip_paths:
+            yield read_xyz_from_zip(zip_path)
+
+
+def assemble_mosaic(tiles, left_upper_x, left_upper_y, shape, nodata_value=-9999.0, spacing=1):
+    # Scatter the points of every tile into one preallocated raster. Row 0 is the northern edge,
+    # (left_upper_x, left_upper_y) is the UTM cell center of the upper left node.
+    mosaic = np.full(shape, nodata_value, dtype=float)
+    for x, y, elev in tiles:
+        rows = np.rint((left_upper_y - y) / spacing).astype(np.intp)
+        cols = np.rint((x - left_upper_x) / spacing).astype(np.intp)
+        inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+        mosaic[rows[inside], cols[inside]] = elev[inside]
+    return mosaic
@@ -1,13 +1,38 @@
-from pyproj import Proj, transform
+from functools import lru_cache
+from pyproj import Proj, Transformer
+import numpy as np
 
-def utm_to_latlon(coordinates):
-    utm_zone_number = 32  # Assuming UTM zone 32 for the example
-    p = Proj(proj='utm', zone=utm_zone_number, ellps='WGS84')
-    lon, lat = p(coordinates[0], coordinates[1], inverse=True)
+DEFAULT_UTM_ZONE = 32
+
+@lru_cache(maxsize=None)
+def get_transformer(utm_zone_number=DEFAULT_UTM_ZONE):
+    # Built once per zone, constructing a Proj/Transformer is far more expensive than transforming points
+    utm = Proj(proj='utm', zone=utm_zone_number, ellps='WGS84')
+    return Transformer.from_proj(utm.crs.geodetic_crs, utm.crs, always_xy=True)
+
+def utm_to_latlon(coordinates, utm_zone_number=DEFAULT_UTM_ZONE):
+    lon, lat = get_transformer(utm_zone_number).transform(coordinates[0], coordinates[1], direction="INVERSE")
+    return lat, lon
+
+def latlon_to_utm(coordinates, utm_zone_number=DEFAULT_UTM_ZONE):
+    x, y = get_transformer(utm_zone_number).transform(coordinates[1], coordinates[0])
+    return x, y
+
+def utm_to_latlon_array(x, y, utm_zone_number=DEFAULT_UTM_ZONE):
+    # Batch version of utm_to_latlon, one transform call for all points
+    lon, lat = get_transformer(utm_zone_number).transform(np.asarray(x, dtype=float), np.asarray(y, dtype=float), direction="INVERSE")
     return lat, lon
 
-def latlon_to_utm(coordinates):
-    utm_zone_number = 32  # Assuming UTM zone 32 for the example
-    p = Proj(proj='utm', zone=utm_zone_number, ellps='WGS84')
-    x, y = p(coordinates[1], coordinates[0])
-    return x, y
\ No newline at end of file
+def latlon_to_utm_array(lat, lon, utm_zone_number=DEFAULT_UTM_ZONE):
+    # Batch version of latlon_to_utm, one transform call for all points
+    return get_transformer(utm_zone_number).transform(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+
+def latlon_outlines_to_utm(outlines, utm_zone_number=DEFAULT_UTM_ZONE):
+    # Converts a list of (lat, long) polygon outlines with a single transform call, returns one (n, 2) array per outline
+    outlines = [np.asarray(outline, dtype=float).reshape(-1, 2) for outline in outlines]
+    if not outlines:
+        return []
+    vertices = np.concatenate(outlines)
+    x, y = latlon_to_utm_array(vertices[:, 0], vertices[:, 1], utm_zone_number)
+    split_at = np.cumsum([len(outline) for outline in outlines])[:-1]
+    return np.split(np.column_stack((x, y)), split_at)
@@ -1,12 +1,50 @@
 from BayernAtlas.BayerAtlas import BayernAtlas
+from CoordinateConversion.utils import latlon_outlines_to_utm
+from shapely.geometry import Polygon
+from shapely.ops import unary_union
 import json
 
+def build_region_of_interest(outlines, buffer=50, as_polygon=False):
+    """
+    Build a region of interest in UTM from building outlines and river basin outlines given as (lat, long) lists.
+
+    Args:
+        outlines: iterable of polygon outlines in (lat, long) coordinates
+        buffer: distance in meters by which the outlines are grown
+        as_polygon: return the buffered polygon mask instead of its bounding box
+
+    Returns:
+        shapely geometry or (min_x, min_y, max_x, max_y) tuple in UTM
+    """
+    polygons = [Polygon(outline_utm) for outline_utm in latlon_outlines_to_utm(outlines)]
+    region = unary_union(polygons).buffer(buffer)
+    return region if as_polygon else region.bounds
+
 class DataReader:
-    def __init__(self, buildings_data_path):
+    """
+    Lazily evaluated access to the buildings and the raster grid around them. Bounds, tile list and grid
+    are computed on first use and memoized. Call invalidate() after changing buildings or roi.
+    """
+
+    def __init__(self, buildings_data_path, roi=None):
         self.buildings_data_path = buildings_data_path
         self.buildings = self.read_buildings_data()
-        self.grid = self.get_raster_model_grid()
+        # Optional region of interest, see build_region_of_interest. Only its window of the tiles is loaded
+        self.roi = roi
         self.data = None
+        self.invalidate()
+
+    def invalidate(self, reload_buildings=False):
+        if reload_buildings:
+            self.buildings = self.read_buildings_data()
+        self._min_max_coordinates = None
+        self._bayern_atlas = None
+        self._tiles = None
+        self._grid = None
+
+    @property
+    def grid(self):
+        return self.get_raster_model_grid()
 
     def read_buildings_data(self):
         with open(self.buildings_data_path, 'r') as file:
@@ -14,35 +52,46 @@ class DataReader:
         return buildings
     
     def get_min_max_coordinates(self):
-        min_lat = float('inf')
-        max_lat = float('-inf')
-        min_long = float('inf')
-        max_long = float('-inf')
-
-        for building in self.buildings['buildings']:
-            for coordinate in building['building_outline']:
-                lat, long = coordinate
-                if lat < min_lat:
-                    min_lat = lat
-                if lat > max_lat:
-                    max_lat = lat
-                if long < min_long:
-                    min_long = long
-                if long > max_long:
-                    max_long = long
-
-        return min_lat, max_lat, min_long, max_long
+        if self._min_max_coordinates is None:
+            min_lat = float('inf')
+            max_lat = float('-inf')
+            min_long = float('inf')
+            max_long = float('-inf')
+
+            for building in self.buildings['buildings']:
+                for coordinate in building['building_outline']:
+                    lat, long = coordinate
+                    if lat < min_lat:
+                        min_lat = lat
+                    if lat > max_lat:
+                        max_lat = lat
+                    if long < min_long:
+                        min_long = long
+                    if long > max_long:
+                        max_long = long
+
+            self._min_max_coordinates = (min_lat, max_lat, min_long, max_long)
+        return self._min_max_coordinates
+
+    def get_bayern_atlas(self):
+        if self._bayern_atlas is None:
+            min_lat, max_lat, min_long, max_long = self.get_min_max_coordinates()
+            self._bayern_atlas = BayernAtlas(min_lat=min_lat, min_long=min_long, max_lat=max_lat, max_long=max_long)
+        return self._bayern_atlas
+
+    def get_tiles(self):
+        if self._tiles is None:
+            self._tiles = self.get_bayern_atlas().get_tiles(roi=self.roi)
+        return self._tiles
 
     def get_upper_left_coordinate(self):
-        min_lat, max_lat, min_long, max_long = self.get_min_max_coordinates()
-        bayern_atlas = BayernAtlas(min_lat=min_lat, min_long=min_long, max_lat=max_lat, max_long=max_long)
-        utm32_min_lat, _, _, utm32_max_long = bayern_atlas.get_utm32_coordinates()
-        left_upper_x = utm32_min_lat * 1000 + 0.5
-        left_upper_y = utm32_max_long * 1000 + 999.5
+        left, _, _, top = self.get_bayern_atlas().get_utm32_window(roi=self.roi)
+        left_upper_x = left + 0.5
+        left_upper_y = top - 0.5
         return left_upper_x, left_upper_y
 
     def get_raster_model_grid(self):
-        min_lat, max_lat, min_long, max_long = self.get_min_max_coordinates()
-        bavaria = BayernAtlas(min_lat, min_long, max_lat, max_long)
-        grid = bavaria.compute_raster_model_grid()
-        return grid
\ No newline at end of file
+        # The grid is built once, later calls return the same (possibly modified) grid object
+        if self._grid is None:
+            self._grid = self.get_bayern_atlas().compute_raster_model_grid(roi=self.roi)
+        return self._grid
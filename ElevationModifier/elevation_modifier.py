@@ -1,37 +1,210 @@
-from shapely.geometry import Polygon, Point
+from concurrent.futures import ThreadPoolExecutor
+from shapely.geometry import Polygon
+import shapely
 import numpy as np
 
 class ElevationModifier:
     def __init__(self, raster_model_grid, grid_parameter="topographic__elevation"):
         self.raster_model_grid = raster_model_grid
         self.grid_parameter = grid_parameter
+        # key -> (outline, value, node ids) of the polygons rasterized by update_polygons
+        self.footprints = {}
 
-    def modify_elevation_from_polygon(self, increase_by, polygon_outline, flat_top=True):
+    def _node_ids_in_window(self, polygon, xs, ys):
+        # Test the cell centers (x + 0.5, y + 0.5) of all integer coordinates xs × ys at once
+        x, y = np.meshgrid(xs, ys, indexing="ij")
+        inside = shapely.contains_xy(polygon, x + 0.5, y + 0.5)
+
+        # Get the index of the cells containing the coordinates (int() truncation as in the per-point version)
+        left_upper_x, left_upper_y = self.raster_model_grid.left_upper_edge_utm
+        rows = np.trunc(left_upper_y - y[inside]).astype(np.int64)
+        cols = np.trunc(x[inside] - left_upper_x).astype(np.int64)
+        n_rows, n_cols = self.raster_model_grid.shape
+        on_grid = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+        return np.unique(rows[on_grid] * n_cols + cols[on_grid])
+
+    @staticmethod
+    def _integer_range(min_value, max_value):
+        return int(np.floor(min_value)), int(np.ceil(max_value) + 1)
+
+    def get_node_ids_in_polygon(self, polygon_outline):
+        """
+        Return the sorted, unique node ids of all cells whose center lies inside the polygon.
+
+        All integer coordinates in the bounding box of the polygon are tested at once with a
+        vectorized contains_xy on the cell centers (x + 0.5, y + 0.5). Cells outside of the grid are skipped.
+        """
         # Create a shapely Polygon object from the provided list of coordinates
         polygon = Polygon(polygon_outline)
+        shapely.prepare(polygon)
         # Get the bounding box of the polygon
         min_x, min_y, max_x, max_y = polygon.bounds
-        # Get all integer coordinates plus 0.5 within the bounding box
-        coords = [(x, y) for x in range(int(np.floor(min_x)), int(np.ceil(max_x) + 1)) for y in range(int(np.floor(min_y)), int(np.ceil(max_y) + 1))]
+        # Get all integer coordinates within the bounding box
+        xs = np.arange(*self._integer_range(min_x, max_x))
+        ys = np.arange(*self._integer_range(min_y, max_y))
+        return self._node_ids_in_window(polygon, xs, ys)
+
+    def modify_elevation_from_polygon(self, increase_by, polygon_outline, flat_top=True):
+        node_ids_to_increase = self.get_node_ids_in_polygon(polygon_outline)
+        field = self.raster_model_grid.at_node[self.grid_parameter]
+
+        if flat_top and len(node_ids_to_increase) > 0:
+            minimum_height = field[node_ids_to_increase].min()
+            field[node_ids_to_increase] = minimum_height + increase_by
+        else:
+            field[node_ids_to_increase] += increase_by
+        return self.raster_model_grid
+
+    def _polygon_footprints(self, polygons, block_size=256, workers=1):
+        # Returns (node_ids, polygon_index) with one entry for every cell center inside a polygon
+        empty = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        if len(polygons) == 0:
+            return empty
+        shapely.prepare(polygons)
+        tree = shapely.STRtree(polygons)
+        # Integer coordinate ranges [x0, x1) and [y0, y1) of the bounding box of every polygon
+        bounds = shapely.bounds(polygons)
+        x0, y0 = np.floor(bounds[:, 0]).astype(np.int64), np.floor(bounds[:, 1]).astype(np.int64)
+        x1, y1 = np.ceil(bounds[:, 2]).astype(np.int64) + 1, np.ceil(bounds[:, 3]).astype(np.int64) + 1
+
+        # Integer coordinates whose cell centers can fall onto the grid, split into blocks
         left_upper_x, left_upper_y = self.raster_model_grid.left_upper_edge_utm
-        shape = self.raster_model_grid.shape
-        # Iterate over all coordinates and check if they are within the polygon and if so, increase the elevation
-        node_ids_to_increase = set()
-        for coord in coords:
-            one_meter_square = Point(coord[0] + 0.5, coord[1] + 0.5)
-            if polygon.contains(one_meter_square):
-                # Get the index of the cell containing the coordinate
-                coord_as_cell = (coord[0] - left_upper_x, left_upper_y - coord[1])
-                # Increase the elevation of the cell by the specified amount
-                # print(coord_as_cell)
-                node_id = self.raster_model_grid.grid_coords_to_node_id(int(coord_as_cell[1]), int(coord_as_cell[0]))
-                node_ids_to_increase.add(node_id)
-
-        if flat_top and node_ids_to_increase:
-            minimum_height = min([self.raster_model_grid.at_node[self.grid_parameter][node_id] for node_id in node_ids_to_increase])
-            for node_id in node_ids_to_increase:
-                self.raster_model_grid.at_node[self.grid_parameter][node_id] = minimum_height + increase_by
+        n_rows, n_cols = self.raster_model_grid.shape
+        x_start, x_stop = int(np.floor(left_upper_x)) - 1, int(np.ceil(left_upper_x)) + n_cols + 1
+        y_start, y_stop = int(np.floor(left_upper_y)) - n_rows - 1, int(np.ceil(left_upper_y)) + 1
+        blocks = np.array([(bx, min(bx + block_size, x_stop), by, min(by + block_size, y_stop))
+                           for bx in range(x_start, x_stop, block_size) for by in range(y_start, y_stop, block_size)])
+        block_boxes = shapely.box(blocks[:, 0], blocks[:, 2], blocks[:, 1], blocks[:, 3])
+
+        # All (block, polygon) pairs whose envelopes intersect, grouped by block
+        block_index, polygon_index = tree.query(block_boxes)
+        if len(block_index) == 0:
+            return empty
+        order = np.argsort(block_index, kind="stable")
+        block_index, polygon_index = block_index[order], polygon_index[order]
+        groups = np.split(np.arange(len(block_index)), np.flatnonzero(np.diff(block_index)) + 1)
+
+        def rasterize_block(pairs):
+            block = blocks[block_index[pairs[0]]]
+            pids = polygon_index[pairs]
+            # Clip the bounding boxes to the block and enumerate their cells without a Python loop
+            px0, px1 = np.maximum(x0[pids], block[0]), np.minimum(x1[pids], block[1])
+            py0, py1 = np.maximum(y0[pids], block[2]), np.minimum(y1[pids], block[3])
+            widths, heights = np.maximum(px1 - px0, 0), np.maximum(py1 - py0, 0)
+            counts = widths * heights
+            pair = np.repeat(np.arange(len(pids)), counts)
+            local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            x = px0[pair] + local // heights[pair]
+            y = py0[pair] + local % heights[pair]
+            inside = shapely.contains_xy(polygons[pids[pair]], x + 0.5, y + 0.5)
+
+            # Get the index of the cells containing the coordinates (int() truncation as in the per-point version)
+            rows = np.trunc(left_upper_y - y[inside]).astype(np.int64)
+            cols = np.trunc(x[inside] - left_upper_x).astype(np.int64)
+            on_grid = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+            return rows[on_grid] * n_cols + cols[on_grid], pids[pair[inside]][on_grid]
+
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(rasterize_block, groups))
         else:
-            for node_id in node_ids_to_increase:
-                self.raster_model_grid.at_node[self.grid_parameter][node_id] += increase_by
-        return self.raster_model_grid
\ No newline at end of file
+            results = [rasterize_block(pairs) for pairs in groups]
+
+        node_ids = np.concatenate([node_ids for node_ids, _ in results])
+        polygon_index = np.concatenate([pids for _, pids in results])
+        return node_ids, polygon_index
+
+    def rasterize_labels(self, polygon_outlines, labels, block_size=256, workers=1):
+        """
+        Write the label of every polygon into all cells whose center lies inside it, in a single pass.
+
+        The grid is split into blocks of block_size × block_size cells. An STRtree over the polygons
+        gives for every block the polygons overlapping it, so each cell is only tested against
+        polygons whose bounding box covers it. The tests of a block run as one vectorized
+        contains_xy call. Where polygons overlap, the later one in the input wins.
+
+        Args:
+            polygon_outlines: list of polygon outlines in UTM coordinates
+            labels: label per polygon, e.g. the building ids
+            block_size: edge length of the blocks in cells
+            workers: number of threads processing blocks in parallel
+
+        Returns:
+            RasterModelGrid: the grid with the labels written into self.grid_parameter
+        """
+        polygons = np.array([Polygon(outline) for outline in polygon_outlines], dtype=object)
+        labels = np.asarray(labels)
+        field = self.raster_model_grid.at_node[self.grid_parameter]
+        node_ids, polygon_index = self._polygon_footprints(polygons, block_size=block_size, workers=workers)
+        if len(node_ids) == 0:
+            # No cell center inside any polygon, e.g. no buildings or all of them outside of the grid
+            return self.raster_model_grid
+
+        # For every node keep the last polygon in input order
+        order = np.lexsort((polygon_index, node_ids))
+        node_ids, polygon_index = node_ids[order], polygon_index[order]
+        last = np.append(node_ids[1:] != node_ids[:-1], True)
+        field[node_ids[last]] = labels[polygon_index[last]]
+        return self.raster_model_grid
+
+    def update_polygons(self, polygons, mode="label", background=0, block_size=256, workers=1):
+        """
+        Incrementally re-rasterize a keyed polygon collection against the one of the previous call.
+
+        The cell footprint of every polygon is kept between calls. Only the cells of added, removed or
+        changed polygons are touched, the first call rasterizes everything.
+
+        Args:
+            polygons: dict key -> (outline in UTM coordinates, value), e.g. building id -> (outline, label)
+            mode: "label" writes the value into the cells (later polygons win on overlaps, uncovered
+                cells are reset to background), "additive" adds the value like flat_top=False
+            background: value of cells not covered by any polygon in label mode
+            block_size, workers: see rasterize_labels
+
+        Returns:
+            np.ndarray: sorted node ids of all cells whose value may have changed
+        """
+        if mode not in ("label", "additive"):
+            raise ValueError(f"Unknown mode {mode}, expected 'label' or 'additive'")
+        field = self.raster_model_grid.at_node[self.grid_parameter]
+
+        new_outlines = {key: np.asarray(outline, dtype=float) for key, (outline, _) in polygons.items()}
+        stale_keys = [key for key, (outline, value, _) in self.footprints.items()
+                      if key not in polygons or polygons[key][1] != value or not np.array_equal(new_outlines[key], outline)]
+        fresh_keys = [key for key in polygons if key not in self.footprints or key in stale_keys]
+
+        # Take the old footprints of removed and changed polygons off the grid
+        stale_geometries = [Polygon(self.footprints[key][0]) for key in stale_keys]
+        dirty = [np.zeros(0, dtype=np.int64)]
+        for key in stale_keys:
+            _, value, node_ids = self.footprints.pop(key)
+            if mode == "additive":
+                field[node_ids] -= value
+            else:
+                field[node_ids] = background
+            dirty.append(node_ids)
+
+        # Rasterize added and changed polygons only
+        fresh_polygons = np.array([Polygon(new_outlines[key]) for key in fresh_keys], dtype=object)
+        node_ids, polygon_index = self._polygon_footprints(fresh_polygons, block_size=block_size, workers=workers)
+        order = np.argsort(polygon_index, kind="stable")
+        per_polygon = np.split(node_ids[order], np.searchsorted(polygon_index[order], np.arange(1, len(fresh_keys))))
+        for key, node_ids in zip(fresh_keys, per_polygon):
+            node_ids = np.unique(node_ids)
+            self.footprints[key] = (new_outlines[key], polygons[key][1], node_ids)
+            if mode == "additive":
+                field[node_ids] += polygons[key][1]
+            dirty.append(node_ids)
+        # Keep the footprints in input order, this is the order in which overlaps are resolved
+        self.footprints = {key: self.footprints[key] for key in polygons}
+        dirty = np.unique(np.concatenate(dirty))
+
+        if mode == "label" and len(dirty) > 0:
+            # Redraw every polygon overlapping a dirty cell on the dirty cells only, in input order
+            keys = list(self.footprints)
+            current = np.array([Polygon(self.footprints[key][0]) for key in keys], dtype=object)
+            affected = np.unique(shapely.STRtree(current).query(np.array(stale_geometries + list(fresh_polygons), dtype=object))[1])
+            for index in affected:
+                _, value, node_ids = self.footprints[keys[index]]
+                field[node_ids[np.isin(node_ids, dirty, assume_unique=True)]] = value
+        return dirty
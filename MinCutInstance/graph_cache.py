@@ -0,0 +1,61 @@
+import hashlib
+import json
+import numpy as np
+from utils.file_cache import FileCache
+
+# Bump when build_graph changes the numbering or the arcs of the network
+GRAPH_FORMAT_VERSION = 1
+INPUT_FIELDS = ("topographic__elevation", "border_of_river", "building_ids", "relevant")
+
+
+def graph_key(grid, water_height, scaling_factor, connectivity=8):
+    """
+    Content address of a built network: SHA-256 over the input fields of the grid, its shape, the
+    water height, the scaling factor, the neighborhood and the format version.
+    """
+    sha256 = hashlib.sha256()
+    sha256.update(json.dumps([GRAPH_FORMAT_VERSION, list(grid.shape), float(water_height), float(scaling_factor), connectivity]).encode())
+    for name in INPUT_FIELDS:
+        field = np.ascontiguousarray(grid.at_node[name])
+        sha256.update(name.encode())
+        sha256.update(field.dtype.str.encode())
+        sha256.update(field.tobytes())
+    return sha256.hexdigest()
+
+
+class GraphCache(FileCache):
+    """
+    Local cache of built flow networks. Every network is stored as a compressed .npz holding the arc
+    arrays and the node metadata, next to a .json sidecar with its size and last access. Entries are
+    addressed by graph_key, so a changed grid or water height never hits a stale network. Eviction
+    works as in FileCache.
+    """
+    data_suffix = ".npz"
+    entry_name = "graph"
+
+    def __init__(self, cache_dir="./data/graph_cache", max_bytes=1024**3):
+        super().__init__(cache_dir, max_bytes)
+
+    def get(self, key):
+        """
+        Return the arrays stored under key as a dict, or None on a cache miss.
+        """
+        metadata = self._lookup(key)
+        if metadata is None:
+            return None
+        data_path, _ = self._paths(key)
+        try:
+            with np.load(data_path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError, KeyError):
+            self.discard(key)
+            return None
+
+        self._touch(key, metadata)
+        return arrays
+
+    def put(self, key, arrays):
+        """
+        Store the dict of arrays under key and evict least recently used networks above max_bytes.
+        """
+        self._store(key, lambda f: np.savez_compressed(f, **arrays), {"key": key})
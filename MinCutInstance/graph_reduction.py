@@ -0,0 +1,114 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order
+
+
+def reachable(n_nodes, tails, heads, starts):
+    """
+    Boolean mask of all nodes reachable from any of the start nodes along the arcs tails -> heads.
+    Pass the arcs reversed (heads, tails) for the nodes which can reach the start nodes.
+    """
+    reached = np.zeros(n_nodes, dtype=bool)
+    starts = np.asarray(starts, dtype=np.int64)
+    if len(starts) == 0:
+        return reached
+    # A virtual node n_nodes with an arc to every start node turns this into a single BFS
+    tails = np.concatenate([tails, np.full(len(starts), n_nodes)])
+    heads = np.concatenate([heads, starts])
+    adjacency = csr_matrix((np.ones(len(tails), dtype=np.int8), (tails, heads)), shape=(n_nodes + 1, n_nodes + 1))
+    order = breadth_first_order(adjacency, n_nodes, directed=True, return_predecessors=False)
+    reached[order[order < n_nodes]] = True
+    return reached
+
+
+class GraphReduction:
+    """
+    Shrinks a flow network without changing its minimum cut value.
+
+    1) Zero capacity arcs are dropped, e.g. the in->out arcs of cells above the water height.
+    2) Nodes which are not reachable from the source or cannot reach the sink never carry flow and
+       are removed, e.g. dead ends of the relevant region without a building behind them.
+    3) Nodes reachable from the source along infinite arcs are merged into the source, nodes reaching
+       the sink along infinite arcs into the sink (river border nodes and the in-nodes next to them).
+    4) Nodes whose only outgoing arc is infinite are merged into its head (building cells into their
+       building node).
+    5) Parallel arcs of the contracted network are combined into one.
+
+    node_map maps every original node to its node in the reduced network (-1 for removed nodes) and
+    expand turns a source side of the reduced network back into one of the original network.
+    """
+
+    def __init__(self, n_nodes, tails, heads, capacities, source, sink, infinity):
+        self.original_nodes = n_nodes
+        self.original_source, self.original_sink = source, sink
+        positive = capacities > 0
+        tails, heads, capacities = tails[positive], heads[positive], capacities[positive]
+        self._positive_tails, self._positive_heads = tails, heads
+
+        # --- Nodes on some source -> sink path ---
+        self.from_source = reachable(n_nodes, tails, heads, [source])
+        live = self.from_source & reachable(n_nodes, heads, tails, [sink])
+        live[[source, sink]] = True
+        self.live = live
+        keep = live[tails] & live[heads]
+        tails, heads, capacities = tails[keep], heads[keep], capacities[keep]
+
+        # --- Representative of every live node ---
+        representative = np.arange(n_nodes)
+        infinite = capacities >= infinity
+        to_source = reachable(n_nodes, tails[infinite], heads[infinite], [source])
+        to_sink = reachable(n_nodes, heads[infinite], tails[infinite], [sink])
+        # Infinite arcs never saturate, a source -> sink path of them makes the cut infinite anyway
+        to_sink &= ~to_source
+        representative[to_source] = source
+        representative[to_sink] = sink
+
+        out_degree = np.bincount(tails, minlength=n_nodes)
+        single = (out_degree == 1) & ~to_source & ~to_sink
+        single[[source, sink]] = False
+        single_arcs = single[tails] & infinite
+        representative[tails[single_arcs]] = heads[single_arcs]
+        # Follow chains of merged nodes to their end
+        while True:
+            jumped = representative[representative]
+            if np.array_equal(jumped, representative):
+                break
+            representative = jumped
+
+        # --- Number the reduced nodes, source and sink keep the ids 0 and 1 ---
+        kept = np.unique(representative[live])
+        kept = np.concatenate([[source, sink], kept[(kept != source) & (kept != sink)]])
+        new_id = np.full(n_nodes, -1, dtype=np.int64)
+        new_id[kept] = np.arange(len(kept))
+        self.node_map = np.where(live, new_id[representative], -1)
+        self.source, self.sink = 0, 1
+        self.n_nodes = len(kept)
+
+        # --- Contracted arcs, parallel arcs combined ---
+        tails, heads = self.node_map[tails], self.node_map[heads]
+        keep = (tails != heads) & (heads != self.source) & (tails != self.sink)
+        tails, heads, capacities = tails[keep], heads[keep], capacities[keep]
+        pairs, index = np.unique(tails * self.n_nodes + heads, return_inverse=True)
+        combined = np.zeros(len(pairs), dtype=np.int64)
+        # Sums of infinite arcs stay at infinity
+        np.add.at(combined, index.reshape(-1), np.minimum(capacities, infinity))
+        self.tails, self.heads = np.divmod(pairs, self.n_nodes)
+        self.capacities = np.minimum(combined, infinity)
+
+    def expand(self, source_side):
+        """
+        Map a source side mask of the reduced network to the original network.
+
+        Merged nodes take the side of their representative. Removed nodes, which carry no flow, are on
+        the source side if they can be reached from it along arcs with positive capacity.
+        """
+        original = np.zeros(self.original_nodes, dtype=bool)
+        original[self.live] = source_side[self.node_map[self.live]]
+        original[self.original_source] = True
+        original[self.original_sink] = False
+        dead = self.from_source & ~self.live
+        tails, heads = self._positive_tails, self._positive_heads
+        seeds = heads[original[tails] & dead[heads]]
+        inside = dead[tails] & dead[heads]
+        original |= reachable(self.original_nodes, tails[inside], heads[inside], np.unique(seeds))
+        return original
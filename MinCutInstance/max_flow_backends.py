@@ -0,0 +1,125 @@
+from ortools.graph.python import max_flow
+import time
+import numpy as np
+
+try:
+    import maxflow  # PyMaxflow, optional
+except ImportError:
+    maxflow = None
+
+
+class MaxFlowBackend:
+    """
+    Interface of the max-flow solvers used by MinCutInstance.
+
+    A backend gets the network as arc arrays and returns the flow value and a boolean mask of the
+    nodes on the source side of a minimum cut. Minimum cuts are not unique, backends may return
+    different source sides of the same capacity. The time spent on loading the arcs and on solving
+    is kept in arc_load_time and solve_time.
+    """
+    name = None
+    # Whether get_flows is implemented
+    reports_flows = False
+
+    def __init__(self):
+        self.arc_load_time = None
+        self.solve_time = None
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def solve(self, n_nodes, tails, heads, capacities, source, sink):
+        raise NotImplementedError
+
+    def get_flows(self):
+        """
+        Flow on every arc of the last solve, in the order of the arcs passed to solve.
+        """
+        raise NotImplementedError(f"The {self.name} backend does not report arc flows")
+
+
+class OrToolsMaxFlow(MaxFlowBackend):
+    """
+    Push-relabel max flow of OR-Tools (SimpleMaxFlow). The source side consists of the nodes
+    reachable from the source in the residual graph, i.e. the smallest one.
+    """
+    name = "ortools"
+    reports_flows = True
+
+    def solve(self, n_nodes, tails, heads, capacities, source, sink):
+        smf = max_flow.SimpleMaxFlow()
+        start = time.perf_counter()
+        smf.add_arcs_with_capacity(tails, heads, capacities)
+        self.arc_load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        status = smf.solve(source, sink)
+        self.solve_time = time.perf_counter() - start
+        if status != max_flow.SimpleMaxFlow.OPTIMAL:
+            raise ValueError("Max flow problem has no optimal solution.")
+
+        source_side = np.zeros(n_nodes, dtype=bool)
+        source_side[np.asarray(smf.get_source_side_min_cut(), dtype=np.int64)] = True
+        self._smf = smf
+        self._n_arcs = len(tails)
+        return smf.optimal_flow(), source_side
+
+    def get_flows(self):
+        return np.asarray(self._smf.flows(np.arange(self._n_arcs)), dtype=np.int64)
+
+
+class BoykovKolmogorovMaxFlow(MaxFlowBackend):
+    """
+    Boykov-Kolmogorov max flow of PyMaxflow, which is built for grid graphs like ours.
+
+    Arcs leaving the source and entering the sink become terminal capacities. Capacities are held
+    as doubles, which is exact for the integer capacities used here (all below 2**53).
+    """
+    name = "boykov_kolmogorov"
+
+    @classmethod
+    def is_available(cls):
+        return maxflow is not None
+
+    def solve(self, n_nodes, tails, heads, capacities, source, sink):
+        if maxflow is None:
+            raise ImportError("The boykov_kolmogorov backend needs PyMaxflow (pip install PyMaxflow)")
+        start = time.perf_counter()
+        from_source = (tails == source) & (heads != sink)
+        to_sink = (heads == sink) & (tails != source)
+        inner = (tails != source) & (heads != sink) & (tails != sink) & (heads != source)
+        # Arcs directly from source to sink are always part of the cut
+        direct_flow = int(capacities[(tails == source) & (heads == sink)].sum())
+
+        graph = maxflow.GraphFloat(n_nodes, int(np.count_nonzero(inner)))
+        nodes = graph.add_nodes(n_nodes)
+        graph.add_edges(tails[inner], heads[inner], capacities[inner].astype(float), np.zeros(np.count_nonzero(inner)))
+        source_capacities = np.bincount(heads[from_source], weights=capacities[from_source], minlength=n_nodes)
+        sink_capacities = np.bincount(tails[to_sink], weights=capacities[to_sink], minlength=n_nodes)
+        terminals = np.flatnonzero((source_capacities > 0) | (sink_capacities > 0))
+        graph.add_grid_tedges(nodes[terminals], source_capacities[terminals], sink_capacities[terminals])
+        self.arc_load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        flow_value = int(round(graph.maxflow())) + direct_flow
+        self.solve_time = time.perf_counter() - start
+
+        # get_grid_segments is True for nodes on the sink side
+        source_side = ~graph.get_grid_segments(nodes)
+        source_side[source] = True
+        source_side[sink] = False
+        return flow_value, source_side
+
+
+BACKENDS = {backend.name: backend for backend in (OrToolsMaxFlow, BoykovKolmogorovMaxFlow)}
+
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend.is_available()]
+
+
+def get_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown max flow backend {name}, choose one of {list(BACKENDS)}")
+    return BACKENDS[name]()
@@ -1,31 +1,59 @@
-from ortools.graph.python import max_flow
+import time
+from functools import partial
 import numpy as np
 import matplotlib.pyplot as plt
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from RelevantGridGetter.relevant_grid_getter import neighbor_offsets
+from MinCutInstance.max_flow_backends import available_backends, get_backend
+from MinCutInstance.graph_reduction import GraphReduction, reachable
+from MinCutInstance.graph_cache import graph_key
+from utils.general_operations import create_process_pool
+
+# Node categories as stored in MinCutInstance.node_category
+NORMAL_IN, NORMAL_OUT, RIVER, BUILDING, BUILDING_SINK, SOURCE, SINK = range(7)
+CATEGORY_NAMES = ["normal_in", "normal_out", "river", "building", "building_sink", "source", "sink"]
+# Arrays of a built network besides source, sink and building_arcs
+GRAPH_ARRAYS = ("tails", "heads", "capacities", "node_category", "node_cell", "building_nodes", "building_ids")
+
+def _solve_component(component, backend="ortools", infinity=None):
+    # component is (n_nodes, tails, heads, capacities, source, sink) of one independent subnetwork,
+    # with an infinity it is shrunk with GraphReduction first
+    if isinstance(backend, str):
+        backend = get_backend(backend)
+    if infinity is None:
+        flow, source_side = backend.solve(*component)
+    else:
+        reduction = GraphReduction(*component, infinity)
+        flow, source_side = backend.solve(reduction.n_nodes, reduction.tails, reduction.heads, reduction.capacities, reduction.source, reduction.sink)
+        source_side = reduction.expand(source_side)
+    return flow, source_side, backend.arc_load_time
 
 class MinCutInstance:
     def __init__(self, grid, building_weight=1, scaling_factor=1e6):
         self.grid = grid
-        self.node_positions = {}
-        self.categories = {}
         self.building_weight = building_weight
-        self.arcs = []  # (u, v, capacity)
-        self.node_map = {}  # internal mapping for grid nodes
+        # arcs as contiguous arrays of tail node, head node and integer capacity
+        self.tails = np.zeros(0, dtype=np.int64)
+        self.heads = np.zeros(0, dtype=np.int64)
+        self.capacities = np.zeros(0, dtype=np.int64)
+        # node metadata: category, grid node of cell nodes (-1 otherwise) and building node -> building id
+        self.node_category = np.zeros(0, dtype=np.int8)
+        self.node_cell = np.zeros(0, dtype=np.int32)
+        self.building_nodes = np.zeros(0, dtype=np.int64)
+        self.building_ids = np.zeros(0)
+        # positions of the building -> sink arcs, the only arcs depending on building_weight
+        self.building_arcs = slice(0, 0)
+        # water height, source and sink of the last built graph
+        self.water_height = None
+        self.source = None
+        self.sink = None
         self.scaling_factor = scaling_factor  # to convert float capacities to int
         self.infinity = int(int(1e9)*self.scaling_factor)
+        self.arc_load_time = None
+        self.solve_time = None
 
-    def build_graph(self, water_height):
-        def eight_neighbors(grid, nid):
-            nrows, ncols = grid.shape
-            row, col = np.unravel_index(nid, (nrows, ncols))
-            neighbors = []
-            for dr in [-1, 0, 1]:
-                for dc in [-1, 0, 1]:
-                    if dr == 0 and dc == 0:
-                        continue
-                    r, c = row + dr, col + dc
-                    if 0 <= r < nrows and 0 <= c < ncols:
-                        neighbors.append(r * ncols + c)
-            return neighbors
+    def build_graph(self, water_height, cache=None):
         """
         Build a directed graph according to the problem rules:
         1) Building and river border cells -> single node
@@ -35,137 +63,146 @@ class MinCutInstance:
         5) River border nodes connected to adjacent normal in-nodes
         6) Building nodes connected to their cell nodes
         7) Sink connected from building nodes
+
+        Node ids follow from cumulative sums over the cell masks and all neighbor arcs come from
+        shifted 8-neighbor stencils, the arcs end up in the arrays self.tails, self.heads and self.capacities.
+
+        With a GraphCache the network is loaded from the cache if the same fields, water height and
+        scaling factor were built before, otherwise it is built and stored.
         """
+        if cache is not None:
+            key = graph_key(self.grid, water_height, self.scaling_factor)
+            arrays = cache.get(key)
+            if arrays is not None:
+                self.set_graph_arrays(arrays)
+                self.water_height = water_height
+                self.set_building_weight(self.building_weight)
+                return self.source, self.sink
+
         grid = self.grid
         elev = grid.at_node["topographic__elevation"]
-        border = grid.at_node["border_of_river"]
+        border = grid.at_node["border_of_river"] == 1
         bldg_ids = grid.at_node["building_ids"]
-        relevant = grid.at_node["relevant"]
+        relevant = grid.at_node["relevant"] != 0
 
         n_nodes = grid.number_of_nodes
-        xy = (grid.node_x, grid.node_y)
-
-        self.node_positions.clear()
-        self.categories.clear()
-        self.arcs.clear()
-        self.node_map.clear()
-
-        node_id_counter = 0
-        building_nodes = {}  # building_id -> node_id
+        nrows, ncols = grid.shape
 
         # --- Create grid cell nodes ---
-        for nid in range(n_nodes):
-            if relevant[nid] == 0:
-                continue
-
-            x, y = xy[0][nid], xy[1][nid]
-
-            if border[nid] == 1 or bldg_ids[nid] != 0:
-                # single node
-                self.node_positions[node_id_counter] = (x, y)
-                cat = "river" if border[nid] == 1 else "building"
-                self.categories[node_id_counter] = cat
-                self.node_map[(nid, "single")] = node_id_counter
-                node_id_counter += 1
-            else:
-                # normal node: in + out
-                in_id, out_id = node_id_counter, node_id_counter + 1
-                node_id_counter += 2
-
-                self.node_positions[in_id] = (x, y)
-                self.node_positions[out_id] = (x, y)
-                self.categories[in_id] = "normal_in"
-                self.categories[out_id] = "normal_out"
-
-                self.node_map[(nid, "in")] = in_id
-                self.node_map[(nid, "out")] = out_id
-
-                cap = max(0, water_height - elev[nid])
-                #round cap to two decimals
-                cap = round(cap, 2)
-                cap = int(cap * self.scaling_factor)
-                self.arcs.append((in_id, out_id, cap))
+        # building and river border cells get a single node, normal cells an in- and an out-node
+        single = relevant & (border | (bldg_ids != 0))
+        normal = relevant & ~single
+        nodes_per_cell = single.astype(np.int64) + 2 * normal
+        first_node = np.cumsum(nodes_per_cell) - nodes_per_cell  # single node or in-node of each cell
+        out_node = first_node + normal  # out-node of normal cells, the single node otherwise
+        node_id_counter = int(nodes_per_cell.sum())
+
+        normal_nids = np.flatnonzero(normal)
+        cap = np.maximum(0, water_height - elev[normal_nids])
+        #round cap to two decimals (Python's round on the few distinct values keeps the exact per-cell result)
+        unique_caps, cap_index = np.unique(cap, return_inverse=True)
+        unique_caps = np.array([int(round(c, 2) * self.scaling_factor) for c in unique_caps.tolist()], dtype=np.int64)
+        arcs = [(first_node[normal_nids], first_node[normal_nids] + 1, unique_caps[cap_index.reshape(-1)])]
 
         # --- Source and sink ---
         source = node_id_counter
         sink = node_id_counter + 1
         node_id_counter += 2
-        self.categories[source] = "source"
-        self.categories[sink] = "sink"
-        self.node_positions[source] = (-1, -1)
-        self.node_positions[sink] = (-2, -2)
 
         # --- River border -> source edges ---
-        for (nid, role), node_id in self.node_map.items():
-            if role == "single" and border[nid] == 1:
-                self.arcs.append((source, node_id, self.infinity))
+        border_nids = np.flatnonzero(relevant & border)
+        arcs.append((np.full(len(border_nids), source), first_node[border_nids], np.full(len(border_nids), self.infinity)))
 
         # --- Building nodes (unique per building id) ---
-        for b_id in np.unique(bldg_ids[bldg_ids > 0]):
-            b_node = node_id_counter
-            node_id_counter += 1
-            building_nodes[b_id] = b_node
-            self.node_positions[b_node] = (0, -b_id * 2)
-            self.categories[b_node] = "building_sink"
-            # connect building node -> sink
-            self.arcs.append((b_node, sink, int(self.building_weight * self.scaling_factor)))
+        building_ids = np.unique(bldg_ids[bldg_ids > 0])
+        building_nodes = node_id_counter + np.arange(len(building_ids))
+        node_id_counter += len(building_ids)
+        # connect building node -> sink
+        first_building_arc = sum(len(tails) for tails, _, _ in arcs)
+        self.building_arcs = slice(first_building_arc, first_building_arc + len(building_ids))
+        arcs.append((building_nodes, np.full(len(building_ids), sink), np.full(len(building_ids), int(self.building_weight * self.scaling_factor))))
 
         # --- Connect building cells to building node ---
-        for nid in range(n_nodes):
-            if relevant[nid] == 0 or bldg_ids[nid] == 0:
-                continue
-            bid = bldg_ids[nid]
-            cell_node = self.node_map.get((nid, "single"))
-            if cell_node is not None:
-                self.arcs.append((cell_node, building_nodes[bid], self.infinity))
+        building_cells = np.flatnonzero(relevant & (bldg_ids != 0))
+        building_of_cell = building_nodes[np.searchsorted(building_ids, bldg_ids[building_cells])]
+        arcs.append((first_node[building_cells], building_of_cell, np.full(len(building_cells), self.infinity)))
 
         # --- Neighbor connections ---
-        for nid in range(n_nodes):
-            if relevant[nid] == 0:
-                continue
-
-            if bldg_ids[nid] != 0:
-                continue  # no building cell neighbors
-
-            neighbors = eight_neighbors(self.grid, nid)
-            for nb in neighbors:
-                if nb < 0 or relevant[nb] == 0:
-                    continue
-
-                if border[nid] == 1 and border[nb] == 1:
-                    continue  # no river->river edges
-
-                # source node
-                if (nid, "out") in self.node_map:
-                    src = self.node_map[(nid, "out")]
-                elif (nid, "single") in self.node_map:
-                    src = self.node_map[(nid, "single")]
-                else:
-                    continue
-
-                # destination node
-                if (nb, "in") in self.node_map:
-                    dst = self.node_map[(nb, "in")]
-                elif (nb, "single") in self.node_map:
-                    dst = self.node_map[(nb, "single")]
-                else:
-                    continue
-
-                self.arcs.append((src, dst, self.infinity))
-
-        # --- River borders -> adjacent normal in-nodes ---
-        for nid in range(n_nodes):
-            if border[nid] != 1 or relevant[nid] == 0:
-                continue
+        def neighbor_stencil(nids):
+            # (len(nids), 8) array of 8-neighbors in the order of neighbor_offsets, -1 outside of the grid
+            row, col = np.divmod(nids, ncols)
+            neighbors = np.full((len(nids), 8), -1, dtype=np.int64)
+            for k, (dr, dc) in enumerate(neighbor_offsets(8)):
+                r, c = row + dr, col + dc
+                inside = (r >= 0) & (r < nrows) & (c >= 0) & (c < ncols)
+                neighbors[inside, k] = r[inside] * ncols + c[inside]
+            return neighbors
 
-            river_node = self.node_map.get((nid, "single"))
-            for nb in eight_neighbors(self.grid, nid):
-                if relevant[nb] == 1 and (nb, "in") in self.node_map:
-                    dst = self.node_map[(nb, "in")]
-                    self.arcs.append((river_node, dst, self.infinity))
+        # no building cell neighbors and no river->river edges
+        nids = np.flatnonzero(relevant & (bldg_ids == 0))
+        neighbors = neighbor_stencil(nids)
+        valid = neighbors >= 0
+        valid[valid] = relevant[neighbors[valid]] & ~(border[nids][np.nonzero(valid)[0]] & border[neighbors[valid]])
+        tail_cells, head_cells = np.broadcast_to(nids[:, np.newaxis], neighbors.shape)[valid], neighbors[valid]
+        arcs.append((out_node[tail_cells], first_node[head_cells], np.full(len(head_cells), self.infinity)))
 
+        # --- River borders -> adjacent normal in-nodes ---
+        neighbors = neighbor_stencil(border_nids)
+        valid = neighbors >= 0
+        valid[valid] = normal[neighbors[valid]]
+        tail_cells, head_cells = np.broadcast_to(border_nids[:, np.newaxis], neighbors.shape)[valid], neighbors[valid]
+        arcs.append((first_node[tail_cells], first_node[head_cells], np.full(len(head_cells), self.infinity)))
+
+        self.tails = np.ascontiguousarray(np.concatenate([tails for tails, _, _ in arcs]), dtype=np.int64)
+        self.heads = np.ascontiguousarray(np.concatenate([heads for _, heads, _ in arcs]), dtype=np.int64)
+        self.capacities = np.ascontiguousarray(np.concatenate([caps for _, _, caps in arcs]), dtype=np.int64)
+
+        # --- Node metadata ---
+        single_nids = np.flatnonzero(single)
+        self.node_category = np.empty(node_id_counter, dtype=np.int8)
+        self.node_category[first_node[single_nids]] = np.where(border[single_nids], RIVER, BUILDING)
+        self.node_category[first_node[normal_nids]] = NORMAL_IN
+        self.node_category[first_node[normal_nids] + 1] = NORMAL_OUT
+        self.node_category[source] = SOURCE
+        self.node_category[sink] = SINK
+        self.node_category[building_nodes] = BUILDING_SINK
+        self.node_cell = np.full(node_id_counter, -1, dtype=np.int32)
+        self.node_cell[first_node[single_nids]] = single_nids
+        self.node_cell[first_node[normal_nids]] = normal_nids
+        self.node_cell[first_node[normal_nids] + 1] = normal_nids
+        self.building_nodes = building_nodes
+        self.building_ids = building_ids
+        self.water_height = water_height
+        self.source = source
+        self.sink = sink
+
+        if cache is not None:
+            cache.put(key, self.get_graph_arrays())
         return source, sink
 
+    def get_graph_arrays(self):
+        """
+        All arrays describing the built network, as stored by GraphCache.
+        """
+        arrays = {name: getattr(self, name) for name in GRAPH_ARRAYS}
+        arrays["terminals"] = np.array([self.source, self.sink])
+        arrays["building_arc_range"] = np.array([self.building_arcs.start, self.building_arcs.stop])
+        return arrays
+
+    def set_graph_arrays(self, arrays):
+        for name in GRAPH_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.source, self.sink = (int(node) for node in arrays["terminals"])
+        self.building_arcs = slice(*(int(arc) for arc in arrays["building_arc_range"]))
+
+    def set_building_weight(self, building_weight):
+        """
+        Change the building weight of the built graph in place. Only the building -> sink capacities
+        are patched, the next run_max_flow hands the same arc arrays to the solver.
+        """
+        self.building_weight = building_weight
+        self.capacities[self.building_arcs] = int(building_weight * self.scaling_factor)
+
     def visualize(self, max_edges_to_draw=5000, show_elevation=False, out_offset=0.2):
         """
         Fast visualization of the flow network with arrows and offset for out-nodes.
@@ -188,15 +225,11 @@ class MinCutInstance:
                 alpha=0.4,
             )
 
-        pos = {}
+        pos = self.get_node_positions()
         dx = dy = out_offset
 
         # --- Apply offset to out-nodes ---
-        for n, (x, y) in self.node_positions.items():
-            if self.categories.get(n) == "normal_out":
-                pos[n] = (x + dx, y + dy)
-            else:
-                pos[n] = (x, y)
+        pos[self.node_category == NORMAL_OUT] += (dx, dy)
 
         color_map = {
             "normal_in": "#a6cee3",
@@ -209,11 +242,9 @@ class MinCutInstance:
         }
 
         # --- Draw nodes ---
-        for cat in sorted(set(self.categories.values())):
-            nodes = [n for n, c in self.categories.items() if c == cat]
-            if not nodes:
-                continue
-            xy = np.array([pos[n] for n in nodes])
+        for category in np.unique(self.node_category):
+            cat = CATEGORY_NAMES[category]
+            xy = pos[self.node_category == category]
             plt.scatter(
                 xy[:, 0],
                 xy[:, 1],
@@ -225,24 +256,23 @@ class MinCutInstance:
 
         # --- Draw directed edges ---
         arrow_alpha = 0.2
-        for (u, v, cap) in self.arcs[:max_edges_to_draw]:
-            if u in pos and v in pos:
-                x1, y1 = pos[u]
-                x2, y2 = pos[v]
-                # draw light line
-                plt.plot([x1, x2], [y1, y2], color="k", alpha=0.05, linewidth=0.4)
-                # draw small arrow for direction
-                plt.arrow(
-                    x1, y1,
-                    (x2 - x1) * 0.8,
-                    (y2 - y1) * 0.8,
-                    head_width=0.1,
-                    head_length=0.15,
-                    fc="k",
-                    ec="k",
-                    alpha=arrow_alpha,
-                    length_includes_head=True,
-                )
+        for u, v in zip(self.tails[:max_edges_to_draw].tolist(), self.heads[:max_edges_to_draw].tolist()):
+            x1, y1 = pos[u]
+            x2, y2 = pos[v]
+            # draw light line
+            plt.plot([x1, x2], [y1, y2], color="k", alpha=0.05, linewidth=0.4)
+            # draw small arrow for direction
+            plt.arrow(
+                x1, y1,
+                (x2 - x1) * 0.8,
+                (y2 - y1) * 0.8,
+                head_width=0.1,
+                head_length=0.15,
+                fc="k",
+                ec="k",
+                alpha=arrow_alpha,
+                length_includes_head=True,
+            )
 
         plt.legend(markerscale=3, frameon=False)
         plt.axis("off")
@@ -250,78 +280,194 @@ class MinCutInstance:
         plt.tight_layout()
         plt.show()
 
-    def run_min_cut(self, source, sink):
+    def run_min_cut(self, source, sink, backend="ortools"):
         """
-        Run the min-cut algorithm using the new OR-Tools API.
+        Run the min-cut algorithm, returns the node ids on the source side and on the sink side.
         """
-        flow, smf = self.run_max_flow(source, sink)
-        return self.get_min_cut(smf)
+        flow, source_side = self.run_max_flow(source, sink, backend=backend)
+        return self.get_min_cut(source_side)
 
-    def run_max_flow(self, source, sink):
+    def run_max_flow(self, source, sink, backend="ortools", reduce=False, split_components=False, processes=1):
         """
-        Run the max-flow algorithm using the new OR-Tools API.
+        Run the max-flow algorithm with one of the backends of max_flow_backends.
+
+        Args:
+            source, sink: node ids returned by build_graph
+            backend: backend name (see available_backends()) or a MaxFlowBackend instance
+            reduce: shrink the network with GraphReduction before solving, the source side is mapped back
+            split_components: solve the connected components independently, see run_max_flow_by_components
+            processes: number of worker processes for the components
+
+        Returns:
+            (int, np.ndarray): flow value and boolean mask of the nodes on the source side of the min cut.
+            The time spent on loading the arcs and on solving is kept in self.arc_load_time and self.solve_time.
         """
-        smf = max_flow.SimpleMaxFlow()
-        print(smf)
-        for u, v, cap in self.arcs:
-            smf.add_arc_with_capacity(u, v, cap)
-
-        status = smf.solve(source, sink)
-        if status == max_flow.SimpleMaxFlow.OPTIMAL:
-            return smf.optimal_flow(), smf
+        if split_components:
+            return self.run_max_flow_by_components(source, sink, backend=backend, processes=processes, reduce=reduce)
+        if isinstance(backend, str):
+            backend = get_backend(backend)
+        if reduce:
+            start = time.perf_counter()
+            reduction = GraphReduction(len(self.node_category), self.tails, self.heads, self.capacities, source, sink, self.infinity)
+            print(f"Graph reduction: {len(self.node_category)} -> {reduction.n_nodes} nodes, {len(self.tails)} -> {len(reduction.tails)} arcs "
+                  f"in {time.perf_counter() - start:.2f}s")
+            flow, source_side = backend.solve(reduction.n_nodes, reduction.tails, reduction.heads, reduction.capacities, reduction.source, reduction.sink)
+            source_side = reduction.expand(source_side)
+            n_arcs = len(reduction.tails)
         else:
-            raise ValueError("Max flow problem has no optimal solution.")
+            flow, source_side = backend.solve(len(self.node_category), self.tails, self.heads, self.capacities, source, sink)
+            n_arcs = len(self.tails)
+        self.arc_load_time = backend.arc_load_time
+        self.solve_time = backend.solve_time
+        print(f"Max flow ({backend.name}): loaded {n_arcs} arcs in {self.arc_load_time:.2f}s, solved in {self.solve_time:.2f}s")
+        return flow, source_side
+
+    def benchmark_backends(self, source, sink, backends=None):
+        """
+        Solve the current graph with several backends and check that they agree on the cut value.
+
+        Args:
+            backends: backend names, all installed backends by default
 
-    def get_min_cut(self, smf):
+        Returns:
+            dict: backend name -> {"flow_value", "arc_load_time", "solve_time", "same_cut"}, where same_cut
+            tells whether the source side equals the one of the first backend
         """
-        Retrieve the minimum cut from the solved max-flow instance.
+        results = {}
+        reference = None
+        for name in backends or available_backends():
+            flow, source_side = self.run_max_flow(source, sink, backend=name)
+            if reference is None:
+                reference = (name, flow, source_side)
+            elif flow != reference[1]:
+                raise ValueError(f"Max flow backends disagree: {reference[0]} found {reference[1]}, {name} found {flow}")
+            results[name] = {
+                "flow_value": flow,
+                "arc_load_time": self.arc_load_time,
+                "solve_time": self.solve_time,
+                "same_cut": bool(np.array_equal(source_side, reference[2])),
+            }
+        return results
+
+    def get_components(self, source, sink):
         """
-        source_side = smf.get_source_side_min_cut()
-        sink_side = smf.get_sink_side_min_cut()
-        return source_side, sink_side
-    
-    def get_cut_cells(self, smf):
+        Split the network without source and sink into connected components.
+
+        Returns:
+            (np.ndarray, np.ndarray): component label of every node (-1 for source and sink) and the
+            labels of the components holding a building node
         """
-        Return the grid node indices of normal cells where the (in->out) arc lies in the min cut.
+        n_nodes = len(self.node_category)
+        inner = (self.tails != source) & (self.tails != sink) & (self.heads != source) & (self.heads != sink)
+        adjacency = csr_matrix((np.ones(np.count_nonzero(inner), dtype=np.int8), (self.tails[inner], self.heads[inner])), shape=(n_nodes, n_nodes))
+        _, labels = connected_components(adjacency, directed=False)
+        labels[[source, sink]] = -1
+        return labels, np.unique(labels[self.building_nodes])
+
+    def run_max_flow_by_components(self, source, sink, backend="ortools", processes=1, reduce=False):
         """
-        source_side = set(smf.get_source_side_min_cut())
-        sink_side = set(smf.get_sink_side_min_cut())
-
-        cut_cells = []
-        for (nid, role), node_id in self.node_map.items():
-            if role != "in":
-                continue
+        Solve every connected component of the network as an independent max flow problem.
 
-            out_id = self.node_map.get((nid, "out"))
-            if out_id is None:
-                continue
+        Pockets of the relevant region are only linked through the source and the sink, so the max flow
+        is the sum over the components. Components without a building carry no flow and are not solved,
+        their nodes are on the source side if they are reachable from it. Components are solved on a
+        process pool, largest first. With reduce every component is shrunk with GraphReduction first.
 
-            # If in-node is reachable from source, but out-node is not, this arc crosses the cut
-            if node_id in source_side and out_id in sink_side:
-                cut_cells.append(nid)
+        Returns:
+            (int, np.ndarray): flow value and source side mask like run_max_flow
+        """
+        start = time.perf_counter()
+        n_nodes = len(self.node_category)
+        labels, with_building = self.get_components(source, sink)
+
+        # Component of every arc, arcs between source and sink have none (-1)
+        arc_labels = np.where(self.tails == source, labels[self.heads], labels[self.tails])
+        # One extra entry so that the label -1 of source and sink indexes a False
+        solved = np.zeros(labels.max() + 2, dtype=bool)
+        solved[with_building] = True
+        arc_order = np.argsort(arc_labels, kind="stable")
+        arc_order = arc_order[solved[arc_labels[arc_order]]]
+        node_order = np.argsort(labels, kind="stable")
+        node_order = node_order[solved[labels[node_order]]]
+
+        # Local node ids inside every component, source and sink follow after the component nodes
+        node_groups = np.split(node_order, np.flatnonzero(np.diff(labels[node_order])) + 1) if len(node_order) else []
+        arc_groups = np.split(arc_order, np.flatnonzero(np.diff(arc_labels[arc_order])) + 1) if len(arc_order) else []
+        local_id = np.zeros(n_nodes, dtype=np.int64)
+        components = []
+        for nodes, arcs in zip(node_groups, arc_groups):
+            local_id[nodes] = np.arange(len(nodes))
+            local_id[source], local_id[sink] = len(nodes), len(nodes) + 1
+            components.append((len(nodes) + 2, local_id[self.tails[arcs]], local_id[self.heads[arcs]],
+                               self.capacities[arcs], len(nodes), len(nodes) + 1))
+        order = sorted(range(len(components)), key=lambda i: -components[i][0])
+
+        solve = partial(_solve_component, backend=backend, infinity=self.infinity if reduce else None)
+        if processes == 1 or len(components) <= 1:
+            results = list(map(solve, [components[i] for i in order]))
+        else:
+            with create_process_pool(processes) as executor:
+                results = list(executor.map(solve, [components[i] for i in order]))
+
+        source_side = np.zeros(n_nodes, dtype=bool)
+        source_side[source] = True
+        flow = int(self.capacities[(self.tails == source) & (self.heads == sink)].sum())
+        for i, (component_flow, component_side, _) in zip(order, results):
+            flow += component_flow
+            source_side[node_groups[i]] = component_side[:len(node_groups[i])]
+        # Components without a building: everything reachable from the source
+        unsolved = ~solved[labels]
+        unsolved[[source, sink]] = False
+        arcs = (self.capacities > 0) & unsolved[self.heads]
+        source_side |= reachable(n_nodes, self.tails[arcs], self.heads[arcs], [source]) & unsolved
+
+        self.arc_load_time = sum(arc_load_time for _, _, arc_load_time in results)
+        self.solve_time = time.perf_counter() - start
+        print(f"Max flow by components: {len(components)} of {labels.max() + 1} components with buildings, "
+              f"largest {max([c[0] - 2 for c in components], default=0)} nodes, solved in {self.solve_time:.2f}s")
+        return flow, source_side
+
+    def get_min_cut(self, source_side):
+        """
+        Node ids on the source side and on the sink side of the minimum cut.
+        """
+        return np.flatnonzero(source_side).tolist(), np.flatnonzero(~source_side).tolist()
 
-        return cut_cells
+    def get_node_positions(self):
+        """
+        Return an (n, 2) array of node positions: cell nodes at their grid node, source at (-1, -1),
+        sink at (-2, -2) and building nodes at (0, -2 * building_id).
+        """
+        positions = np.zeros((len(self.node_category), 2))
+        cells = self.node_cell >= 0
+        positions[cells, 0] = self.grid.node_x[self.node_cell[cells]]
+        positions[cells, 1] = self.grid.node_y[self.node_cell[cells]]
+        positions[self.node_category == SOURCE] = (-1, -1)
+        positions[self.node_category == SINK] = (-2, -2)
+        positions[self.building_nodes, 1] = -2 * self.building_ids
+        return positions
+
+    def get_cut_cells(self, source_side):
+        """
+        Return the grid node indices of normal cells where the (in->out) arc lies in the min cut,
+        i.e. the in-node is on the source side, the out-node is not and the arc has a positive capacity.
+        Together with the flooded buildings these arcs add up to the flow value.
+        """
+        in_nodes = np.flatnonzero(self.node_category == NORMAL_IN)
+        cut = source_side[in_nodes] & ~source_side[in_nodes + 1]
+        # in->out arcs are the first arcs of the graph, in the order of the in-nodes
+        cut &= self.capacities[:len(in_nodes)] > 0
+        return self.node_cell[in_nodes[cut]].tolist()
     
-    def get_buildings_in_cut(self, smf):
+    def get_buildings_in_cut(self, source_side):
         """
         Returns a list of building IDs where the building→sink arc is part of the min cut,
         i.e., the building node is on the source side and the sink is on the sink side.
 
         Args:
-            smf (max_flow.SimpleMaxFlow): Solved max-flow instance.
+            source_side (np.ndarray): boolean source side mask returned by run_max_flow.
 
         Returns:
             List[int]: Building IDs in the cut (disconnected or 'flooded' buildings).
         """
-        source_side = set(smf.get_source_side_min_cut())
-        flooded_buildings = []
-
-        for node_id, cat in self.categories.items():
-            if cat == "building_sink" and node_id in source_side:
-                # building_sink node position encoding: y = -2 * b_id  →  b_id = int(abs(y) / 2)
-                x, y = self.node_positions[node_id]
-                b_id = int(abs(y) / 2)
-                flooded_buildings.append(b_id)
-
-        return flooded_buildings
-
+        return self.building_ids[source_side[self.building_nodes]].astype(int).tolist()
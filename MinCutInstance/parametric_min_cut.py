@@ -0,0 +1,161 @@
+import numpy as np
+from MinCutInstance.max_flow_backends import get_backend
+
+
+class ParametricMinCut:
+    """
+    Minimum cuts of a built MinCutInstance for all building weights (lambda) at once.
+
+    Only the building -> sink capacities depend on lambda and they grow with it, so the minimal
+    source sides are nested: S(lambda_2) ⊆ S(lambda_1) for lambda_1 < lambda_2 (Gallo, Grigoriadis and
+    Tarjan). The cost of a cut is sandbag capacity + lambda * flooded buildings, i.e. a line in lambda,
+    and the optimal cost is the lower envelope of these lines. The breakpoints of the envelope are
+    found by intersecting the lines of two solved lambdas and solving at the intersection
+    (Eisner and Severance). Every solve between two solved lambdas only works on the nodes whose side
+    is not yet known from the nesting: nodes on the source side of the larger lambda are merged into
+    the source, nodes on the sink side of the smaller lambda into the sink.
+    """
+
+    def __init__(self, min_cut_instance, source, sink, backend="ortools"):
+        self.instance = min_cut_instance
+        self.source = source
+        self.sink = sink
+        self.backend = backend
+        # building weight in capacity units -> solution
+        self.solutions = {}
+
+    def solve(self, building_weight, lower=None, upper=None):
+        """
+        Solve the min cut for one building weight.
+
+        Args:
+            building_weight: lambda, converted to capacity units as in build_graph
+            lower, upper: solutions of a smaller and a larger weight used to shrink the problem
+
+        Returns:
+            dict: see _solve_weight
+        """
+        return self._solve_weight(int(building_weight * self.instance.scaling_factor), lower=lower, upper=upper)
+
+    def _solve_weight(self, weight, lower=None, upper=None):
+        if weight in self.solutions:
+            return self.solutions[weight]
+        instance = self.instance
+        n_nodes = len(instance.node_category)
+        capacities = instance.capacities.copy()
+        capacities[instance.building_arcs] = weight
+
+        # Nodes with a known side are contracted into the source and the sink
+        fixed_source = np.zeros(n_nodes, dtype=bool)
+        fixed_source[self.source] = True
+        if upper is not None:
+            fixed_source |= upper["source_side"]
+        fixed_sink = np.zeros(n_nodes, dtype=bool)
+        fixed_sink[self.sink] = True
+        if lower is not None:
+            fixed_sink |= ~lower["source_side"]
+        free = ~fixed_source & ~fixed_sink
+        n_free = int(np.count_nonzero(free))
+        source, sink = n_free, n_free + 1
+        label = np.where(fixed_source, source, sink)
+        label[free] = np.arange(n_free)
+
+        tails, heads = label[instance.tails], label[instance.heads]
+        # Arcs from the source group to the sink group are cut in any case
+        across = (tails == source) & (heads == sink)
+        constant = int(capacities[across].sum())
+        # Arcs inside a group, into the source or out of the sink never cross the cut
+        keep = (tails != heads) & (heads != source) & (tails != sink) & ~across
+        source_side = fixed_source.copy()
+        if n_free > 0 and np.any(keep):
+            if isinstance(self.backend, str):
+                backend = get_backend(self.backend)
+            else:
+                backend = self.backend
+            flow, sub_source_side = backend.solve(n_free + 2, tails[keep], heads[keep], capacities[keep], source, sink)
+            source_side[free] = sub_source_side[:n_free]
+        else:
+            flow = 0
+
+        flow_value = flow + constant
+        flooded_buildings = instance.get_buildings_in_cut(source_side)
+        sandbag_capacity = flow_value - len(flooded_buildings) * weight
+        solution = {
+            "building_weight": weight / instance.scaling_factor,
+            "flow_value": flow_value,
+            "sandbag_capacity": sandbag_capacity,
+            "sandbags_needed": sandbag_capacity / instance.scaling_factor,
+            "flooded_buildings": flooded_buildings,
+            "source_side": source_side,
+            "free_nodes": n_free,
+        }
+        self.solutions[weight] = solution
+        print(f"lambda = {solution['building_weight']}: {len(flooded_buildings)} flooded buildings, "
+              f"{solution['sandbags_needed']} sandbags, solved on {n_free} of {n_nodes} nodes")
+        return solution
+
+    def default_lambda_max(self):
+        """
+        A building weight above the capacity of all finite cell arcs, where every building that can be
+        protected at all is protected. It stays below the infinite capacity so infinite arcs are never cut.
+        """
+        instance = self.instance
+        finite = instance.capacities < instance.infinity
+        finite[instance.building_arcs] = False
+        weight = min(int(instance.capacities[finite].sum()) + 1, instance.infinity - 1)
+        return weight / instance.scaling_factor
+
+    def breakpoints(self, lambda_min=0, lambda_max=None):
+        """
+        Compute the whole tradeoff curve between sandbags and flooded buildings on [lambda_min, lambda_max].
+
+        Returns:
+            list of dict: one entry per segment of the lower envelope ordered by increasing lambda, with
+            lambda_from and lambda_to (the breakpoints), sandbags_needed, flooded_buildings and cut_cells
+        """
+        scaling_factor = self.instance.scaling_factor
+        if lambda_max is None:
+            lambda_max = self.default_lambda_max()
+        low = self.solve(lambda_min)
+        high = self.solve(lambda_max, lower=low)
+
+        pending = [(int(lambda_min * scaling_factor), int(lambda_max * scaling_factor))]
+        while pending:
+            left_weight, right_weight = pending.pop()
+            left, right = self.solutions[left_weight], self.solutions[right_weight]
+            left_count, right_count = len(left["flooded_buildings"]), len(right["flooded_buildings"])
+            if left_count == right_count:
+                continue
+            # Intersection of the cost lines of both solutions
+            weight = round((right["sandbag_capacity"] - left["sandbag_capacity"]) / (left_count - right_count))
+            if not left_weight < weight < right_weight:
+                continue
+            middle = self._solve_weight(weight, lower=left, upper=right)
+            if len(middle["flooded_buildings"]) in (left_count, right_count):
+                # No cut is cheaper at the intersection, it is a breakpoint of the envelope
+                continue
+            pending += [(left_weight, weight), (weight, right_weight)]
+
+        # One line per number of flooded buildings, ordered by increasing lambda
+        lines = []
+        for weight in sorted(w for w in self.solutions if int(lambda_min * scaling_factor) <= w <= int(lambda_max * scaling_factor)):
+            solution = self.solutions[weight]
+            if not lines or len(lines[-1]["flooded_buildings"]) != len(solution["flooded_buildings"]):
+                lines.append(solution)
+
+        curve = []
+        for i, solution in enumerate(lines):
+            if i + 1 < len(lines):
+                following = lines[i + 1]
+                lambda_to = (following["sandbag_capacity"] - solution["sandbag_capacity"]) / (
+                    len(solution["flooded_buildings"]) - len(following["flooded_buildings"])) / scaling_factor
+            else:
+                lambda_to = lambda_max
+            curve.append({
+                "lambda_from": curve[-1]["lambda_to"] if curve else lambda_min,
+                "lambda_to": lambda_to,
+                "sandbags_needed": solution["sandbags_needed"],
+                "flooded_buildings": solution["flooded_buildings"],
+                "cut_cells": self.instance.get_cut_cells(solution["source_side"]),
+            })
+        return curve
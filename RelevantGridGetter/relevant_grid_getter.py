@@ -1,66 +1,154 @@
 import numpy as np
+from scipy import ndimage, sparse
+from scipy.sparse import csgraph
+
+def neighbor_offsets(connectivity=4):
+    # (row, col) offsets of the 4 or 8 neighbors of a cell
+    if connectivity == 4:
+        return [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    if connectivity == 8:
+        return [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if (dr, dc) != (0, 0)]
+    raise ValueError(f"connectivity must be 4 or 8, got {connectivity}")
+
+def any_neighbor(mask, connectivity=4):
+    """
+    For a 2D boolean mask return a mask of all cells with at least one neighbor in mask.
+    Neighbors outside of the grid do not count.
+    """
+    result = np.zeros_like(mask, dtype=bool)
+    n_rows, n_cols = mask.shape
+    for dr, dc in neighbor_offsets(connectivity):
+        # result[r, c] |= mask[r + dr, c + dc] for all cells where the neighbor exists
+        result[max(0, -dr):n_rows - max(0, dr), max(0, -dc):n_cols - max(0, dc)] |= \
+            mask[max(0, dr):n_rows - max(0, -dr), max(0, dc):n_cols - max(0, -dc)]
+    return result
 
 class RelevantGridGetter:
     def __init__(self, grid):
         self.grid = grid
 
-    # Define helper function to get neighbors for a node
-    def get_neighbors(self, node_id):
-        rows, cols = self.grid.shape
-        row, col = divmod(node_id, cols)  # Convert flat index to (row, col)
-        neighbors = []
-        if row > 0:  # Up
-            neighbors.append(node_id - cols)
-        if row < rows - 1:  # Down
-            neighbors.append(node_id + cols)
-        if col > 0:  # Left
-            neighbors.append(node_id - 1)
-        if col < cols - 1:  # Right
-            neighbors.append(node_id + 1)
-        return neighbors
-    
-    def get_border_of_river(self):
+    def get_border_of_river(self, connectivity=4):
+        # A river cell is on the border if any of its neighbors is not part of the river
         self.grid.add_zeros("border_of_river", at="node")
-        for node_id in range(self.grid.number_of_nodes):
-            if self.grid.at_node["river"][node_id] > 0:
-                neighbors = self.get_neighbors(node_id)
-                for neighbor in neighbors:
-                    if self.grid.at_node["river"][neighbor] == 0:
-                        self.grid.at_node["border_of_river"][node_id] = 1
+        river = self.grid.at_node["river"].reshape(self.grid.shape)
+        border = (river > 0) & any_neighbor(river == 0, connectivity)
+        self.grid.at_node["border_of_river"][border.reshape(-1)] = 1
         return self.grid
     
-    def get_relevant_nodes(self, river_height=380, elevation_threshold=1):
-        self.grid.add_zeros("relevant", at="node")
+    def get_passable_cells(self, connectivity=4):
+        # Cells the flood can pass through once they are below the water: no inner river cells and only
+        # the perimeter of buildings
+        shape = self.grid.shape
+        river = self.grid.at_node["river"].reshape(shape)
+        border = self.grid.at_node["border_of_river"].reshape(shape)
+        buildings = self.grid.at_node["building_ids"].reshape(shape)
+        inner_river = river - border > 0
+        inner_building = (buildings > 0) & ~any_neighbor(buildings == 0, connectivity)
+        return ~inner_river & ~inner_building
 
-        # Set all river border nodes to relevant
-        self.grid.at_node["relevant"] = self.grid.at_node["border_of_river"].copy()
+    def get_relevant_nodes(self, river_height=380, elevation_threshold=1, connectivity=4):
+        """
+        Mark all cells which the river can reach at river_height + elevation_threshold.
 
-        border_nodes = np.where(self.grid.at_node["border_of_river"] == 1)[0]
-        queue = set(border_nodes)
+        Starting from the river border, the region grows over all cells at or below the critical height,
+        except for inner river cells and building cells without a non-building neighbor (only the
+        perimeter of a building is relevant). Instead of a node queue, the region is found by labeling
+        the connected components of these cells and keeping those which contain a river border cell.
+        River border cells above the critical height stay relevant but do not spread.
+        """
+        self.grid.add_zeros("relevant", at="node")
+        shape = self.grid.shape
+        elevation = self.grid.at_node["topographic__elevation"].reshape(shape)
+        border = self.grid.at_node["border_of_river"].reshape(shape)
 
         critical_height = river_height + elevation_threshold
 
-        while len(queue) > 0:
-            node = queue.pop()
-            #check all neighbors of the node
-            neighbors = self.get_neighbors(node)
-            geodesic_elevation = self.grid.at_node["topographic__elevation"][node]
-            if geodesic_elevation <= critical_height:
-                value = 1
-
-                if self.grid.at_node["river"][node] - self.grid.at_node["border_of_river"][node] > 0:
-                    value = 0
-                
-                if value == 1 and self.grid.at_node["building_ids"][node] > 0:
-                    value = 0
-                    for neighbor in neighbors:
-                        if self.grid.at_node["building_ids"][neighbor] == 0:
-                            value = 1
-                            break
-                
-                self.grid.at_node["relevant"][node] = value
-                if value == 1:
-                    for neighbor in neighbors:
-                        if self.grid.at_node["relevant"][neighbor] == 0:
-                            queue.add(neighbor)
-        return self.grid
\ No newline at end of file
+        # Cells which are relevant once the flood reaches them and pass it on to their neighbors
+        below = elevation <= critical_height
+        spreading = below & self.get_passable_cells(connectivity)
+
+        structure = ndimage.generate_binary_structure(2, 1 if connectivity == 4 else 2)
+        labels, _ = ndimage.label(spreading, structure=structure)
+        reached = np.unique(labels[(border == 1) & spreading])
+        flooded = np.isin(labels, reached[reached > 0])
+
+        relevant = flooded | ((border == 1) & ~below)
+        self.grid.at_node["relevant"][relevant.reshape(-1)] = 1
+        return self.grid
+
+    def get_flood_arrival_levels(self, connectivity=4):
+        """
+        Store in the field "flood_arrival_level" the lowest critical height at which each cell becomes
+        part of the flood-connected region of get_relevant_nodes (infinity if it never does).
+
+        This is the minimax path problem from the river border: over all paths of passable cells, the
+        smallest possible maximum elevation. It is solved on a minimum spanning tree of the grid graph
+        (edge weight: higher elevation of both cells, plus a virtual source joined to the passable
+        border cells), where the minimax value of a cell is the heaviest edge on its tree path to the source.
+        """
+        self.grid.add_zeros("flood_arrival_level", at="node", clobber=True)
+        shape = self.grid.shape
+        n_nodes = self.grid.number_of_nodes
+        elevation = self.grid.at_node["topographic__elevation"].reshape(shape)
+        border = self.grid.at_node["border_of_river"].reshape(shape) == 1
+        passable = self.get_passable_cells(connectivity) & np.isfinite(elevation)
+        node_ids = np.arange(n_nodes).reshape(shape)
+
+        # Edges between neighboring passable cells, each undirected edge once, and from the source to the border
+        tails, heads = [node_ids[border & passable]], [np.full(np.count_nonzero(border & passable), n_nodes)]
+        n_rows, n_cols = shape
+        for dr, dc in neighbor_offsets(connectivity):
+            if (dr, dc) < (0, 0):
+                continue
+            here = (slice(0, n_rows - dr), slice(max(0, -dc), n_cols - max(0, dc)))
+            there = (slice(dr, n_rows), slice(max(0, dc), n_cols - max(0, -dc)))
+            both = passable[here] & passable[there]
+            tails.append(node_ids[here][both])
+            heads.append(node_ids[there][both])
+        tails, heads = np.concatenate(tails), np.concatenate(heads)
+        flat_elevation = np.append(elevation.reshape(-1), -np.inf)
+        weights = np.maximum(flat_elevation[tails], flat_elevation[heads])
+
+        # Ranks keep the order of the elevations exactly and are never 0 (which csgraph treats as no edge)
+        levels, ranks = np.unique(weights, return_inverse=True)
+        graph = sparse.coo_matrix((ranks + 1.0, (tails, heads)), shape=(n_nodes + 1, n_nodes + 1)).tocsr()
+        tree = csgraph.minimum_spanning_tree(graph)
+        tree = (tree + tree.T).tocsr()
+        order, predecessors = csgraph.breadth_first_order(tree, n_nodes, directed=False, return_predecessors=True)
+
+        # Heaviest edge to the source by pointer jumping along the predecessors of the tree
+        reached = order[1:]
+        up = np.arange(n_nodes + 1)
+        up[reached] = predecessors[reached]
+        heaviest = np.zeros(n_nodes + 1)
+        heaviest[reached] = np.asarray(tree[reached, predecessors[reached]]).ravel()
+        while np.any(up[reached] != n_nodes):
+            heaviest = np.maximum(heaviest, heaviest[up])
+            up = up[up]
+
+        arrival = np.full(n_nodes, np.inf)
+        reached = reached[reached < n_nodes]
+        arrival[reached] = levels[heaviest[reached].astype(np.int64) - 1]
+        self.grid.at_node["flood_arrival_level"][:] = arrival
+        self.grid.flood_arrival_connectivity = connectivity
+        return self.grid
+
+    def get_relevant_nodes_from_arrival_levels(self, river_height=380, elevation_threshold=1, connectivity=4):
+        """
+        Same result as get_relevant_nodes for any water level, as a comparison against the field
+        computed once by get_flood_arrival_levels.
+
+        The field is computed if it is missing or was built with another connectivity. It is not
+        updated automatically: call get_flood_arrival_levels again after changing elevation, river,
+        border_of_river or building_ids.
+        """
+        if "flood_arrival_level" not in self.grid.at_node or getattr(self.grid, "flood_arrival_connectivity", None) != connectivity:
+            self.get_flood_arrival_levels(connectivity)
+        critical_height = river_height + elevation_threshold
+        arrival = self.grid.at_node["flood_arrival_level"]
+        elevation = self.grid.at_node["topographic__elevation"]
+        border = self.grid.at_node["border_of_river"] == 1
+        relevant = (arrival <= critical_height) | (border & ~(elevation <= critical_height))
+        self.grid.add_zeros("relevant", at="node", clobber=True)
+        self.grid.at_node["relevant"][relevant] = 1
+        return self.grid
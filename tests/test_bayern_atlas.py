@@ -0,0 +1,40 @@
+import zipfile
+import numpy as np
+import BayernAtlas.BayerAtlas as bayer_atlas
+from BayernAtlas.BayerAtlas import BayernAtlas
+from CoordinateConversion.utils import utm_to_latlon
+
+
+def atlas_around(x, y):
+    # BayernAtlas whose bounding box is a 10 m square at the UTM position (x, y)
+    min_lat, min_long = utm_to_latlon((x, y))
+    max_lat, max_long = utm_to_latlon((x + 10, y + 10))
+    return BayernAtlas(min_lat, min_long, max_lat, max_long)
+
+
+def test_fetch_data_downloads_the_tiles_of_the_region_of_interest(monkeypatch):
+    requested = []
+    monkeypatch.setattr(bayer_atlas, "download_files", lambda downloads, output_directory, max_workers: requested.extend(downloads))
+    atlas = atlas_around(736500, 5384500)
+    # The buffer crosses the western and southern tile boundaries
+    roi = (735950, 5383950, 736600, 5384600)
+    atlas.fetch_data(roi=roi)
+
+    filenames = sorted(filename for _, filename in requested)
+    assert filenames == sorted(f"{lat}_{long}.zip" for lat, long in atlas.get_tiles(roi=roi))
+    assert filenames == ["735_5383.zip", "735_5384.zip", "736_5383.zip", "736_5384.zip"]
+
+
+def test_missing_tiles_and_points_become_walls(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    # Tile 736_5384 holds only the two westernmost cells of its top row, tile 735_5384 is missing
+    with zipfile.ZipFile(tmp_path / "data" / "736_5384.zip", "w") as archive:
+        archive.writestr("736_5384.xyz", "736000.50 5384999.50 381.25\n736001.50 5384999.50 382.50\n")
+    atlas = atlas_around(736500, 5384500)
+    grid = atlas.compute_raster_model_grid(roi=(735998, 5384998, 736004, 5385000), use_cache=False)
+
+    elevation = grid.at_node["topographic__elevation"].reshape(grid.shape)
+    assert grid.shape == (2, 6)
+    np.testing.assert_array_equal(elevation[0], [np.inf, np.inf, 381.25, 382.5, np.inf, np.inf])
+    assert np.all(elevation[1] == np.inf)
@@ -0,0 +1,27 @@
+import numpy as np
+from tests.test_incremental_min_cut import river_grid
+from RelevantGridGetter.relevant_grid_getter import RelevantGridGetter
+from utils.dichotomic_search import run_dichotomic_search
+
+
+def test_reduced_search_matches_full_networks():
+    grid = river_grid(np.random.default_rng(4))
+    RelevantGridGetter(grid).get_relevant_nodes(river_height=380, elevation_threshold=2.5)
+    full = run_dichotomic_search(grid, 1e6, 380, 2.5, lambda_low=0.1, lambda_high=10, processes=1)
+    reduced = run_dichotomic_search(grid, 1e6, 380, 2.5, lambda_low=0.1, lambda_high=10, processes=1, reduce=True)
+    assert sorted(reduced) == sorted(full)
+    for lam in full:
+        assert reduced[lam]["sandbags_needed"] == full[lam]["sandbags_needed"]
+        assert len(reduced[lam]["flooded_buildings"]) == len(full[lam]["flooded_buildings"])
+
+
+def test_search_by_components_matches_full_networks():
+    grid = river_grid(np.random.default_rng(4))
+    RelevantGridGetter(grid).get_relevant_nodes(river_height=380, elevation_threshold=2.5)
+    full = run_dichotomic_search(grid, 1e6, 380, 2.5, lambda_low=0.1, lambda_high=10, processes=1)
+    split = run_dichotomic_search(grid, 1e6, 380, 2.5, lambda_low=0.1, lambda_high=10, processes=1,
+                                  reduce=True, split_components=True, component_processes=2)
+    assert sorted(split) == sorted(full)
+    for lam in full:
+        assert split[lam]["sandbags_needed"] == full[lam]["sandbags_needed"]
+        assert len(split[lam]["flooded_buildings"]) == len(full[lam]["flooded_buildings"])
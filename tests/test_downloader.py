@@ -0,0 +1,175 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from BayernAtlas.utils import download_file, download_files
+
+CONTENT = bytes(range(256)) * 64
+
+
+class TileServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the tile server. Every path serves CONTENT. Behavior is switched with:
+        failures: number of requests answered with 503 before the server recovers
+        status: status code of every answer (e.g. 404)
+        supports_range: honor Range headers with 206, otherwise always send the full body with 200
+        truncate_first: cut the body of the first answer in half and close the connection
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), TileHandler)
+        self.failures = 0
+        self.status = 200
+        self.supports_range = True
+        self.truncate_first = False
+        # (path, Range header) of every request
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class TileHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        range_header = self.headers.get("Range")
+        server.requests.append((self.path, range_header))
+
+        if server.failures > 0:
+            server.failures -= 1
+            self.send_error(503)
+            return
+        if server.status != 200:
+            self.send_error(server.status)
+            return
+
+        status, body = 200, CONTENT
+        if range_header is not None and server.supports_range:
+            offset = int(range_header[len("bytes="):].rstrip("-"))
+            if offset >= len(CONTENT):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(CONTENT)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status, body = 206, CONTENT[offset:]
+
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {len(CONTENT) - len(body)}-{len(CONTENT) - 1}/{len(CONTENT)}")
+        self.end_headers()
+        if server.truncate_first:
+            server.truncate_first = False
+            body = body[:len(body) // 2]
+            self.close_connection = True
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = TileServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_partial(tmp_path, filename, data):
+    with open(os.path.join(tmp_path, filename + ".part"), "wb") as f:
+        f.write(data)
+
+
+def test_download(server, tmp_path):
+    path = download_file(server.url + "/a.zip", tmp_path, "a.zip", backoff=0)
+    assert read(path) == CONTENT
+    assert not os.path.exists(path + ".part")
+    assert server.requests == [("/a.zip", None)]
+
+
+def test_existing_file_is_not_downloaded_again(server, tmp_path):
+    (tmp_path / "a.zip").write_bytes(b"done")
+    assert download_file(server.url + "/a.zip", tmp_path, "a.zip", backoff=0) == os.path.join(tmp_path, "a.zip")
+    assert server.requests == []
+
+
+def test_transient_errors_are_retried(server, tmp_path):
+    server.failures = 2
+    path = download_file(server.url + "/a.zip", tmp_path, "a.zip", retries=3, backoff=0)
+    assert read(path) == CONTENT
+    assert len(server.requests) == 3
+
+
+def test_gives_up_after_retries(server, tmp_path):
+    server.failures = 10
+    assert download_file(server.url + "/a.zip", tmp_path, "a.zip", retries=2, backoff=0) is None
+    assert len(server.requests) == 3
+    assert not os.path.exists(tmp_path / "a.zip")
+
+
+def test_permanent_errors_are_not_retried(server, tmp_path):
+    server.status = 404
+    assert download_file(server.url + "/a.zip", tmp_path, "a.zip", retries=3, backoff=0) is None
+    assert len(server.requests) == 1
+
+
+def test_resume_with_range(server, tmp_path):
+    write_partial(tmp_path, "a.zip", CONTENT[:1000])
+    path = download_file(server.url + "/a.zip", tmp_path, "a.zip", backoff=0)
+    assert read(path) == CONTENT
+    assert server.requests == [("/a.zip", "bytes=1000-")]
+
+
+def test_resume_without_range_support(server, tmp_path):
+    server.supports_range = False
+    write_partial(tmp_path, "a.zip", b"x" * 1000)
+    path = download_file(server.url + "/a.zip", tmp_path, "a.zip", backoff=0)
+    assert read(path) == CONTENT
+
+
+def test_complete_partial_file_answered_with_416(server, tmp_path):
+    write_partial(tmp_path, "a.zip", CONTENT)
+    path = download_file(server.url + "/a.zip", tmp_path, "a.zip", backoff=0)
+    assert read(path) == CONTENT
+    assert server.requests == [("/a.zip", f"bytes={len(CONTENT)}-")]
+
+
+def test_oversized_partial_file_is_restarted(server, tmp_path):
+    write_partial(tmp_path, "a.zip", CONTENT + b"garbage")
+    path = download_file(server.url + "/a.zip", tmp_path, "a.zip", backoff=0)
+    assert read(path) == CONTENT
+    assert server.requests == [("/a.zip", f"bytes={len(CONTENT) + 7}-"), ("/a.zip", None)]
+
+
+def test_truncated_body_is_resumed(server, tmp_path):
+    server.truncate_first = True
+    # Small chunks so the bytes received before the connection dropped reach the partial file
+    path = download_file(server.url + "/a.zip", tmp_path, "a.zip", backoff=0, chunk_size=1024)
+    assert read(path) == CONTENT
+    assert server.requests == [("/a.zip", None), ("/a.zip", f"bytes={len(CONTENT) // 2}-")]
+
+
+def test_truncated_body_without_range_support(server, tmp_path):
+    server.truncate_first = True
+    server.supports_range = False
+    path = download_file(server.url + "/a.zip", tmp_path, "a.zip", backoff=0, chunk_size=1024)
+    assert read(path) == CONTENT
+
+
+def test_download_files(server, tmp_path):
+    downloads = [(f"{server.url}/{i}.zip", f"{i}.zip") for i in range(6)]
+    results = download_files(downloads, tmp_path, max_workers=3, backoff=0)
+    assert sorted(results) == sorted(filename for _, filename in downloads)
+    for path in results.values():
+        assert read(path) == CONTENT
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from landlab import RasterModelGrid
+from ElevationModifier.elevation_modifier import ElevationModifier
+
+
+def make_grid(n_rows, n_cols, left_upper=(1000.5, 2000.5)):
+    grid = RasterModelGrid((n_rows, n_cols))
+    grid.add_zeros("building_ids", at="node")
+    grid.left_upper_edge_utm = left_upper
+    return grid
+
+
+def random_outline(rng, center_x, center_y, max_radius):
+    # Star shaped, possibly concave polygon around the center
+    n_vertices = rng.integers(3, 9)
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n_vertices))
+    radii = rng.uniform(0.2, max_radius, n_vertices)
+    return np.column_stack((center_x + radii * np.cos(angles), center_y + radii * np.sin(angles)))
+
+
+def per_polygon_labels(grid, outlines, labels):
+    # Reference: one polygon after the other, later polygons overwrite earlier ones
+    field = np.zeros(grid.number_of_nodes)
+    elevation_modifier = ElevationModifier(grid, grid_parameter="building_ids")
+    for outline, label in zip(outlines, labels):
+        field[elevation_modifier.get_node_ids_in_polygon(outline)] = label
+    return field
+
+
+def test_empty_polygon_list_leaves_field_untouched():
+    grid = make_grid(10, 12)
+    grid.at_node["building_ids"][:] = 7
+    ElevationModifier(grid, grid_parameter="building_ids").rasterize_labels([], [])
+    assert np.all(grid.at_node["building_ids"] == 7)
+
+
+@pytest.mark.parametrize("outline", [
+    # Far outside of the grid
+    [(0, 0), (10, 0), (10, 10), (0, 10)],
+    # Just left of the grid
+    [(990, 1995), (1000, 1995), (1000, 1999), (990, 1999)],
+    # Sliver between cell centers
+    [(1003.6, 1995.1), (1003.9, 1995.1), (1003.9, 1998.9), (1003.6, 1998.9)],
+])
+def test_polygon_without_cells_leaves_field_untouched(outline):
+    grid = make_grid(10, 12)
+    ElevationModifier(grid, grid_parameter="building_ids").rasterize_labels([outline], [5])
+    assert np.all(grid.at_node["building_ids"] == 0)
+
+
+def test_update_polygons_outside_of_grid():
+    grid = make_grid(10, 12)
+    elevation_modifier = ElevationModifier(grid, grid_parameter="building_ids")
+    dirty = elevation_modifier.update_polygons({1: ([(0, 0), (10, 0), (10, 10), (0, 10)], 5)})
+    assert len(dirty) == 0
+    assert np.all(grid.at_node["building_ids"] == 0)
+
+
+def test_rasterize_labels_matches_per_polygon_rasterization():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        n_rows, n_cols = rng.integers(5, 40, size=2)
+        left_upper = (rng.uniform(0, 100) + 0.5, rng.uniform(100, 200) + 0.5)
+        grid = make_grid(n_rows, n_cols, left_upper)
+        # Polygons overlap each other and the edges of the grid
+        outlines = [random_outline(rng, left_upper[0] + rng.uniform(-5, n_cols + 5), left_upper[1] - rng.uniform(-5, n_rows + 5), 8)
+                    for _ in range(rng.integers(0, 15))]
+        labels = rng.integers(1, 1000, size=len(outlines))
+        block_size = int(rng.integers(2, 20))
+
+        ElevationModifier(grid, grid_parameter="building_ids").rasterize_labels(outlines, labels, block_size=block_size)
+        np.testing.assert_array_equal(grid.at_node["building_ids"], per_polygon_labels(grid, outlines, labels))
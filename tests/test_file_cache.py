@@ -0,0 +1,60 @@
+import os
+import time
+import numpy as np
+from BayernAtlas.tile_cache import TileCache
+from MinCutInstance.graph_cache import GraphCache
+
+
+def test_tile_cache_round_trip(tmp_path):
+    cache = TileCache(cache_dir=str(tmp_path))
+    raster = np.arange(12, dtype=float).reshape(3, 4)
+    cache.put("736_5384", raster)
+    cached = cache.get("736_5384", verify_checksum=True)
+    np.testing.assert_array_equal(cached, raster)
+    assert cached.dtype == np.float32
+    assert cache.get("735_5384") is None
+
+
+def test_tile_cache_detects_changed_source(tmp_path):
+    source = tmp_path / "736_5384.zip"
+    source.write_bytes(b"tile")
+    cache = TileCache(cache_dir=str(tmp_path / "cache"))
+    cache.put("736_5384", np.zeros((2, 2)), source_path=str(source))
+    assert cache.get("736_5384", source_path=str(source)) is not None
+
+    source.write_bytes(b"new tile")
+    assert cache.get("736_5384", source_path=str(source)) is None
+    assert not os.path.exists(tmp_path / "cache" / "736_5384.npy")
+
+
+def test_graph_cache_round_trip_and_corruption(tmp_path):
+    cache = GraphCache(cache_dir=str(tmp_path))
+    arrays = {"tails": np.array([0, 1]), "heads": np.array([1, 2]), "capacities": np.array([5, 10**15])}
+    cache.put("key", arrays)
+    cached = cache.get("key")
+    assert sorted(cached) == sorted(arrays)
+    for name in arrays:
+        np.testing.assert_array_equal(cached[name], arrays[name])
+
+    with open(tmp_path / "key.npz", "ab") as f:
+        f.write(b"garbage")
+    assert cache.get("key") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    raster = np.zeros((100, 100))
+    cache = TileCache(cache_dir=str(tmp_path))
+    cache.put("a", raster)
+    entry_bytes = os.path.getsize(tmp_path / "a.npy")
+    cache.max_bytes = 2 * entry_bytes
+    cache.put("b", raster)
+    # Reading a makes b the least recently used entry, the pauses keep the access times apart
+    time.sleep(0.02)
+    assert cache.get("a") is not None
+    time.sleep(0.02)
+    cache.put("c", raster)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
@@ -0,0 +1,71 @@
+import numpy as np
+from landlab import RasterModelGrid
+from MinCutInstance.graph_reduction import GraphReduction
+from MinCutInstance.max_flow_backends import get_backend
+from MinCutInstance.min_cut_intsance import MinCutInstance
+
+INFINITY = 10**15
+
+
+def cut_capacity(tails, heads, capacities, source_side):
+    return capacities[source_side[tails] & ~source_side[heads]].sum()
+
+
+def test_reduction_keeps_the_min_cut_of_random_networks():
+    rng = np.random.default_rng(0)
+    backend = get_backend("ortools")
+    for _ in range(300):
+        n_nodes, n_arcs = rng.integers(4, 30), rng.integers(1, 80)
+        tails, heads = rng.integers(0, n_nodes, n_arcs), rng.integers(0, n_nodes, n_arcs)
+        capacities = np.where(rng.random(n_arcs) < 0.3, INFINITY, rng.integers(0, 10, n_arcs))
+        loops = tails == heads
+        tails, heads, capacities = tails[~loops], heads[~loops], capacities[~loops]
+
+        flow, _ = backend.solve(n_nodes, tails, heads, capacities, 0, 1)
+        if flow >= INFINITY:
+            # Path of infinite arcs from source to sink, there is no finite cut to keep
+            continue
+        reduction = GraphReduction(n_nodes, tails, heads, capacities, 0, 1, INFINITY)
+        reduced_flow, reduced_side = backend.solve(reduction.n_nodes, reduction.tails, reduction.heads, reduction.capacities,
+                                                   reduction.source, reduction.sink)
+        source_side = reduction.expand(reduced_side)
+
+        assert reduction.n_nodes <= n_nodes
+        assert reduced_flow == flow
+        assert source_side[0] and not source_side[1]
+        assert cut_capacity(tails, heads, capacities, source_side) == flow
+
+
+def random_grid(rng, n_rows, n_cols):
+    # River along the left edge, random terrain and a few small buildings
+    grid = RasterModelGrid((n_rows, n_cols))
+    border = np.zeros((n_rows, n_cols))
+    border[:, 0] = 1
+    buildings = np.zeros((n_rows, n_cols))
+    for building_id in range(1, rng.integers(1, 8)):
+        row, col = rng.integers(1, n_rows - 2), rng.integers(2, n_cols - 3)
+        buildings[row:row + 2, col:col + 3] = building_id
+    relevant = rng.random((n_rows, n_cols)) < 0.9
+    relevant[:, 0] = True
+    fields = {
+        "topographic__elevation": 380 + rng.random((n_rows, n_cols)) * 4,
+        "border_of_river": border,
+        "building_ids": buildings,
+        "relevant": relevant,
+    }
+    for name, values in fields.items():
+        grid.add_field(name, values.reshape(-1).astype(float), at="node")
+    return grid
+
+
+def test_reduced_and_full_grid_networks_agree():
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        grid = random_grid(rng, *(int(n) for n in rng.integers(6, 20, size=2)))
+        min_cut_instance = MinCutInstance(grid, building_weight=float(rng.uniform(0.5, 20)))
+        source, sink = min_cut_instance.build_graph(water_height=382.5)
+
+        flow, _ = min_cut_instance.run_max_flow(source, sink)
+        reduced_flow, source_side = min_cut_instance.run_max_flow(source, sink, reduce=True)
+        assert reduced_flow == flow
+        assert cut_capacity(min_cut_instance.tails, min_cut_instance.heads, min_cut_instance.capacities, source_side) == flow
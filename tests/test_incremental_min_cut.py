@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from landlab import RasterModelGrid
+from MinCutInstance.min_cut_intsance import MinCutInstance
+from RelevantGridGetter.relevant_grid_getter import RelevantGridGetter
+from utils.incremental_min_cut import IncrementalMinCut
+
+
+def river_grid(rng, n_rows=20, n_cols=30, overlapping_basins=False):
+    # River along the left edge, terrain rising away from it and a few small buildings. With overlapping
+    # basins some border cells have river value 2, they are relevant only until the water covers them
+    grid = RasterModelGrid((n_rows, n_cols))
+    river = np.zeros((n_rows, n_cols))
+    river[:, :2] = 1
+    if overlapping_basins:
+        river[:, 1] = rng.integers(1, 3, size=n_rows)
+    buildings = np.zeros((n_rows, n_cols))
+    for building_id in range(1, 7):
+        row, col = rng.integers(1, n_rows - 2), rng.integers(4, n_cols - 3)
+        buildings[row:row + 2, col:col + 2] = building_id
+    elevation = 380 + np.linspace(0, 2, n_cols)[np.newaxis, :] + rng.random((n_rows, n_cols)) * 1.5
+    fields = {"topographic__elevation": elevation, "river": river, "building_ids": buildings}
+    for name, values in fields.items():
+        grid.add_field(name, values.reshape(-1), at="node")
+    RelevantGridGetter(grid).get_border_of_river()
+    return grid
+
+
+def cold_solve(grid, water_height, building_weight):
+    RelevantGridGetter(grid).get_relevant_nodes_from_arrival_levels(river_height=water_height, elevation_threshold=0)
+    min_cut_instance = MinCutInstance(grid, building_weight=building_weight)
+    source, sink = min_cut_instance.build_graph(water_height)
+    flow_value, source_side = min_cut_instance.run_max_flow(source, sink)
+    return flow_value, min_cut_instance.get_buildings_in_cut(source_side)
+
+
+def test_backend_without_arc_flows_is_rejected():
+    grid = river_grid(np.random.default_rng(0))
+    with pytest.raises(ValueError):
+        IncrementalMinCut(grid, backend="boykov_kolmogorov")
+
+
+def test_warm_start_matches_cold_solves():
+    for seed in range(5):
+        grid = river_grid(np.random.default_rng(seed))
+        incremental_min_cut = IncrementalMinCut(grid, building_weight=2)
+        for water_height in np.arange(380.5, 383.5, 0.25):
+            solution = incremental_min_cut.solve(water_height)
+            flow_value, flooded_buildings = cold_solve(grid, water_height, building_weight=2)
+            assert incremental_min_cut.flow_value == flow_value
+            assert len(solution["flooded_buildings"]) == len(flooded_buildings)
+
+
+def test_warm_start_with_overlapping_basins_matches_cold_solves():
+    for seed in range(5):
+        grid = river_grid(np.random.default_rng(seed), overlapping_basins=True)
+        incremental_min_cut = IncrementalMinCut(grid, building_weight=2)
+        for water_height in np.arange(380.5, 383.5, 0.25):
+            solution = incremental_min_cut.solve(water_height)
+            flow_value, flooded_buildings = cold_solve(grid, water_height, building_weight=2)
+            assert incremental_min_cut.flow_value == flow_value
+            assert len(solution["flooded_buildings"]) == len(flooded_buildings)
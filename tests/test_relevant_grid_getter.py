@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from landlab import RasterModelGrid
+from RelevantGridGetter.relevant_grid_getter import RelevantGridGetter, neighbor_offsets
+
+
+def border_of_river_loop(river, connectivity):
+    # Reference: visit every river cell and look at its neighbors one by one
+    n_rows, n_cols = river.shape
+    border = np.zeros(river.shape)
+    for row in range(n_rows):
+        for col in range(n_cols):
+            if river[row, col] <= 0:
+                continue
+            for dr, dc in neighbor_offsets(connectivity):
+                r, c = row + dr, col + dc
+                if 0 <= r < n_rows and 0 <= c < n_cols and river[r, c] == 0:
+                    border[row, col] = 1
+    return border.reshape(-1)
+
+
+@pytest.mark.parametrize("connectivity", [4, 8])
+def test_border_of_river_matches_loop(connectivity):
+    rng = np.random.default_rng(connectivity)
+    for _ in range(300):
+        shape = tuple(int(n) for n in rng.integers(3, 25, size=2))
+        grid = RasterModelGrid(shape)
+        # Random river cells, the river field counts overlapping basins so values above 1 occur
+        river = (rng.random(shape) < rng.uniform(0.1, 0.9)) * rng.integers(1, 3, size=shape)
+        grid.add_field("river", river.reshape(-1).astype(float), at="node")
+
+        RelevantGridGetter(grid).get_border_of_river(connectivity=connectivity)
+        np.testing.assert_array_equal(grid.at_node["border_of_river"], border_of_river_loop(river, connectivity))
+
+
+def flood_grid(rng, shape):
+    # River in the left columns with overlapping basins, random terrain and a few buildings
+    grid = RasterModelGrid(shape)
+    river = np.zeros(shape)
+    river[:, :2] = rng.integers(1, 3, size=(shape[0], 2))
+    buildings = np.zeros(shape)
+    for building_id in range(1, 4):
+        row, col = rng.integers(0, shape[0] - 2), rng.integers(3, shape[1] - 2)
+        buildings[row:row + 2, col:col + 2] = building_id
+    elevation = 380 + rng.random(shape) * 3
+    for name, values in {"topographic__elevation": elevation, "river": river, "building_ids": buildings}.items():
+        grid.add_field(name, values.reshape(-1), at="node")
+    RelevantGridGetter(grid).get_border_of_river()
+    return grid
+
+
+@pytest.mark.parametrize("connectivity", [4, 8])
+def test_arrival_levels_match_relevant_nodes(connectivity):
+    rng = np.random.default_rng(10 + connectivity)
+    for _ in range(50):
+        grid = flood_grid(rng, tuple(int(n) for n in rng.integers(6, 20, size=2)))
+        relevant_grid_getter = RelevantGridGetter(grid)
+        # A field of the other connectivity has to be replaced, not reused
+        relevant_grid_getter.get_flood_arrival_levels(connectivity=12 - connectivity)
+        for water_height in (380.5, 381.5, 382.5):
+            if "relevant" in grid.at_node:
+                grid.delete_field("node", "relevant")
+            relevant_grid_getter.get_relevant_nodes(river_height=water_height, elevation_threshold=0, connectivity=connectivity)
+            expected = grid.at_node["relevant"].copy()
+            relevant_grid_getter.get_relevant_nodes_from_arrival_levels(river_height=water_height, elevation_threshold=0, connectivity=connectivity)
+            np.testing.assert_array_equal(grid.at_node["relevant"], expected)
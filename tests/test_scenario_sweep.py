@@ -0,0 +1,31 @@
+import numpy as np
+from tests.test_incremental_min_cut import river_grid
+from utils.scenario_sweep import run_scenario_sweep
+
+INCREASES = np.arange(0.5, 3.5, 0.5)
+
+
+def table_values(table):
+    return [(row["water_level_increase"], round(row["sandbags_needed"], 6), row["flooded_buildings"]) for row in table]
+
+
+def test_reduced_cold_sweep_matches_warm_start():
+    grid = river_grid(np.random.default_rng(3))
+    warm = run_scenario_sweep(grid, 380, INCREASES, building_weight=2)
+    reduced = run_scenario_sweep(grid, 380, INCREASES, building_weight=2, reduce=True)
+    assert table_values(reduced) == table_values(warm)
+
+
+def test_sweep_by_components_matches_warm_start():
+    grid = river_grid(np.random.default_rng(3))
+    warm = run_scenario_sweep(grid, 380, INCREASES, building_weight=2)
+    split = run_scenario_sweep(grid, 380, INCREASES, building_weight=2, split_components=True, component_processes=2)
+    assert table_values(split) == table_values(warm)
+
+
+def test_sweep_without_arc_flows_falls_back_to_cold_solves():
+    for seed in range(3):
+        grid = river_grid(np.random.default_rng(seed), overlapping_basins=True)
+        warm = run_scenario_sweep(grid, 380, INCREASES, building_weight=2)
+        cold = run_scenario_sweep(grid, 380, INCREASES, building_weight=2, backend="boykov_kolmogorov")
+        assert table_values(cold) == table_values(warm)
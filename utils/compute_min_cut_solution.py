@@ -1,21 +1,41 @@
 from MinCutInstance.min_cut_intsance import MinCutInstance
 
-def compute_min_cut_solution(grid, building_weight, scaling_factor, river_water_level, water_level_increase):
-    solution = {}
-
-    building_weight = building_weight
-    min_cut_instance = MinCutInstance(grid, building_weight=building_weight, scaling_factor=scaling_factor)
-    source, sink = min_cut_instance.build_graph(water_height=river_water_level + water_level_increase)
+def compute_min_cut_solution(grid, building_weight, scaling_factor, river_water_level, water_level_increase, backend="ortools", min_cut_instance=None, reduce_graph=False,
+                             split_components=False, processes=1, graph_cache=None):
+    # Pass the same min_cut_instance for several building weights to build the graph only once
+
+    water_height = river_water_level + water_level_increase
+    if min_cut_instance is None:
+        min_cut_instance = MinCutInstance(grid, building_weight=building_weight, scaling_factor=scaling_factor)
+    elif min_cut_instance.scaling_factor != scaling_factor:
+        raise ValueError("min_cut_instance was created with a different scaling_factor")
+    if min_cut_instance.water_height != water_height:
+        min_cut_instance.building_weight = building_weight
+        min_cut_instance.build_graph(water_height=water_height, cache=graph_cache)
+    else:
+        min_cut_instance.set_building_weight(building_weight)
+    source, sink = min_cut_instance.source, min_cut_instance.sink
 
     vizualization = False
     if vizualization:
         min_cut_instance.visualize(max_edges_to_draw=10000, show_elevation=True)
 
-    flow_value, smf = min_cut_instance.run_max_flow(source, sink)
+    # With split_components independent pockets of the relevant region are solved separately, processes > 1 solves them in parallel
+    flow_value, source_side = min_cut_instance.run_max_flow(source, sink, backend=backend, reduce=reduce_graph,
+                                                            split_components=split_components, processes=processes)
+    solution = summarize_min_cut(min_cut_instance, flow_value, source_side)
+    write_solution_file(solution, building_weight)
+    return solution
 
-    cut_cells = min_cut_instance.get_cut_cells(smf)
+def summarize_min_cut(min_cut_instance, flow_value, source_side):
+    # Solution dict of a solved min cut instance at its current building weight
+    solution = {}
+    building_weight = min_cut_instance.building_weight
+    scaling_factor = min_cut_instance.scaling_factor
 
-    flooded_buildings = min_cut_instance.get_buildings_in_cut(smf)
+    cut_cells = min_cut_instance.get_cut_cells(source_side)
+
+    flooded_buildings = min_cut_instance.get_buildings_in_cut(source_side)
 
     print("Flooded Buildings: ", len(flooded_buildings))
 
@@ -28,11 +48,12 @@ def compute_min_cut_solution(grid, building_weight, scaling_factor, river_water_
     solution['cut_cells'] = cut_cells
     solution['flooded_buildings'] = flooded_buildings
     solution['sandbags_needed'] = sandbags_needed
+    solution['arc_load_time'] = min_cut_instance.arc_load_time
+    solution['solve_time'] = min_cut_instance.solve_time
+    return solution
 
-    #write file
+def write_solution_file(solution, building_weight):
     with open(f"solutions/cut_cells_{building_weight}.txt", "w") as f:
-        f.write("cut_cells:" + ",".join(str(cell) for cell in cut_cells) + "\n")
-        f.write("sandbags_needed:" + str(sandbags_needed) + "\n")
-        f.write("flooded_buildings:" + ",".join(str(bid) for bid in flooded_buildings) + "\n")
-
-    return solution
\ No newline at end of file
+        f.write("cut_cells:" + ",".join(str(cell) for cell in solution['cut_cells']) + "\n")
+        f.write("sandbags_needed:" + str(solution['sandbags_needed']) + "\n")
+        f.write("flooded_buildings:" + ",".join(str(bid) for bid in solution['flooded_buildings']) + "\n")
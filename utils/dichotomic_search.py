@@ -0,0 +1,129 @@
+from functools import partial
+from multiprocessing import shared_memory
+import numpy as np
+from MinCutInstance.min_cut_intsance import MinCutInstance, GRAPH_ARRAYS
+from utils.compute_min_cut_solution import summarize_min_cut, write_solution_file
+from utils.general_operations import create_process_pool
+
+# MinCutInstance of a worker process, set up once by _init_worker
+_worker_instance = None
+_worker_blocks = []
+
+
+def _share_arrays(min_cut_instance):
+    # Copy the graph arrays into shared memory blocks, returns the blocks and name/shape/dtype per array
+    blocks, descriptors = [], {}
+    for name in GRAPH_ARRAYS:
+        array = getattr(min_cut_instance, name)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        descriptors[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, descriptors
+
+
+def _init_worker(descriptors, scaling_factor, building_arcs, source, sink):
+    global _worker_instance
+    instance = MinCutInstance(None, scaling_factor=scaling_factor)
+    for name, (block_name, shape, dtype) in descriptors.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        setattr(instance, name, np.ndarray(shape, dtype=dtype, buffer=block.buf))
+    # Every worker patches the building capacities of its own copy, all other arrays stay shared
+    instance.capacities = instance.capacities.copy()
+    instance.building_arcs = building_arcs
+    instance.source, instance.sink = source, sink
+    _worker_instance = instance
+
+
+def _solve_lambda(building_weight, backend="ortools", min_cut_instance=None, reduce=False, split_components=False, component_processes=1):
+    instance = min_cut_instance if min_cut_instance is not None else _worker_instance
+    instance.set_building_weight(building_weight)
+    flow_value, source_side = instance.run_max_flow(instance.source, instance.sink, backend=backend, reduce=reduce,
+                                                    split_components=split_components, processes=component_processes)
+    return summarize_min_cut(instance, flow_value, source_side)
+
+
+def _next_lambdas(solutions, lam):
+    # Lambdas at the intersections with the neighboring solutions if lam lies on a new segment
+    lower_lam = max([l for l in solutions.keys() if l < lam])
+    higher_lam = min([l for l in solutions.keys() if l > lam])
+    solution, solution_lower, solution_higher = solutions[lam], solutions[lower_lam], solutions[higher_lam]
+    flooded_lam = len(solution['flooded_buildings'])
+    flooded_lower = len(solution_lower['flooded_buildings'])
+    flooded_higher = len(solution_higher['flooded_buildings'])
+
+    if flooded_lam != flooded_lower and flooded_lam != flooded_higher:
+        new_lambda_lower = (solution['sandbags_needed']-solution_lower['sandbags_needed']) / (flooded_lower - flooded_lam)
+        new_lambda_higher = (solution_higher['sandbags_needed']-solution['sandbags_needed']) / (flooded_lam - flooded_higher)
+        return [new_lambda_lower, new_lambda_higher]
+    return []
+
+
+def run_dichotomic_search(grid, scaling_factor, river_water_level, water_level_increase, lambda_low=10, lambda_high=100,
+                          processes=None, backend="ortools", reduce=False, split_components=False, component_processes=1):
+    """
+    Dichotomic search over the building weight (lambda) between lambda_low and lambda_high.
+
+    The graph is built once. Pending lambdas are independent and solved in waves on a process pool:
+    all lambdas of a wave are dispatched together, their results are merged into the breakpoint logic
+    in increasing order of lambda, which yields the lambdas of the next wave. The graph arrays are
+    handed to the workers through shared memory instead of being pickled for every task.
+
+    Args:
+        processes: number of worker processes, None for all cores, 1 solves in this process
+        reduce: shrink the network of every lambda with GraphReduction before solving it
+        split_components: solve the connected components of every network independently
+        component_processes: worker processes for the components of one lambda
+
+    Returns:
+        dict: lambda -> solution as returned by compute_min_cut_solution
+    """
+    min_cut_instance = MinCutInstance(grid, building_weight=lambda_low, scaling_factor=scaling_factor)
+    min_cut_instance.build_graph(water_height=river_water_level + water_level_increase)
+
+    blocks = []
+    if processes == 1:
+        solve = partial(_solve_lambda, backend=backend, min_cut_instance=min_cut_instance, reduce=reduce,
+                        split_components=split_components, component_processes=component_processes)
+        executor = None
+    else:
+        blocks, descriptors = _share_arrays(min_cut_instance)
+        executor = create_process_pool(processes, initializer=_init_worker,
+                                       initargs=(descriptors, scaling_factor, min_cut_instance.building_arcs,
+                                                 min_cut_instance.source, min_cut_instance.sink))
+        solve = partial(_solve_lambda, backend=backend, reduce=reduce, split_components=split_components,
+                        component_processes=component_processes)
+
+    solutions = {}
+    try:
+        wave = [lambda_low, lambda_high]
+        first_wave = True
+        while len(wave) > 0:
+            print("Computing solutions for lambdas:", wave)
+            results = executor.map(solve, wave) if executor is not None else map(solve, wave)
+            for lam, solution in zip(wave, results):
+                solutions[lam] = solution
+                write_solution_file(solution, lam)
+
+            queue = set()
+            if first_wave:
+                solution_low, solution_high = solutions[lambda_low], solutions[lambda_high]
+                if len(solution_low['flooded_buildings']) != len(solution_high['flooded_buildings']):
+                    lambda_start = (solution_high['sandbags_needed']-solution_low['sandbags_needed']) / (len(solution_low['flooded_buildings']) - len(solution_high['flooded_buildings']))
+                    print("Lambda start:", lambda_start)
+                    queue.add(lambda_start)
+                first_wave = False
+            else:
+                for lam in sorted(wave):
+                    queue.update(_next_lambdas(solutions, lam))
+            wave = sorted(lam for lam in queue if lam not in solutions and lambda_low < lam < lambda_high)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    print("Computed solutions for lambdas:", sorted(solutions.keys()))
+    return solutions
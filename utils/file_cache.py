@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import time
+
+
+class FileCache:
+    """
+    Least recently used cache of files in cache_dir. Every entry is a data file <key><data_suffix>
+    next to a .json sidecar with its metadata, which holds at least the size of the data file and
+    the time of the last access. Subclasses decide how the data is serialized and validated.
+
+    Data files and sidecars are written to a temporary file first and then renamed, so a crash
+    never leaves a truncated entry behind. The total size of the data files is capped by max_bytes,
+    the least recently used entries are evicted first.
+    """
+    data_suffix = ".bin"
+    # Name of an entry in messages, e.g. "tile"
+    entry_name = "entry"
+    # Keep the SHA-256 of every data file in its sidecar
+    store_checksum = False
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + self.data_suffix, base + ".json"
+
+    @staticmethod
+    def _checksum(path):
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def _read_metadata(self, key):
+        _, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_metadata(self, key, metadata):
+        _, meta_path = self._paths(key)
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(metadata, f)
+        os.replace(tmp_path, meta_path)
+
+    def remove(self, key):
+        for path in self._paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def discard(self, key):
+        print(f"Cached {self.entry_name} {key} is stale or corrupt, removing it")
+        self.remove(key)
+
+    def _lookup(self, key):
+        # Metadata of key if its data file exists with the recorded size, None on a miss. Entries with
+        # a wrong size are removed.
+        data_path, _ = self._paths(key)
+        metadata = self._read_metadata(key)
+        if metadata is None or not os.path.exists(data_path):
+            return None
+        if os.path.getsize(data_path) != metadata.get("file_size"):
+            self.discard(key)
+            return None
+        return metadata
+
+    def _touch(self, key, metadata):
+        # Mark a served entry as most recently used
+        metadata["last_access"] = time.time()
+        self._write_metadata(key, metadata)
+
+    def _store(self, key, write, metadata=None):
+        """
+        Write the data file of key with write(f) and its sidecar holding metadata, then evict least
+        recently used entries above max_bytes.
+
+        Returns:
+            str: path of the data file
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data_path, _ = self._paths(key)
+        tmp_path = data_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, data_path)
+
+        metadata = dict(metadata or {})
+        metadata["file_size"] = os.path.getsize(data_path)
+        if self.store_checksum:
+            metadata["sha256"] = self._checksum(data_path)
+        metadata["last_access"] = time.time()
+        self._write_metadata(key, metadata)
+        self.evict(keep=key)
+        return data_path
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until the cache fits into max_bytes.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".json"):
+                continue
+            key = filename[:-len(".json")]
+            metadata = self._read_metadata(key)
+            if metadata is None:
+                self.remove(key)
+                continue
+            entries.append((metadata["last_access"], metadata["file_size"], key))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+            total_bytes -= size
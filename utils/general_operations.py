@@ -3,6 +3,7 @@
 ###  - load json file 
 ###  - save graph in a file 
 ###  - load graph from a given path  
+###  - create a process pool
 ###
 ################################################################
 
@@ -11,7 +12,9 @@
 ##########
 
 import json
+import multiprocessing
 import pickle
+from concurrent.futures import ProcessPoolExecutor
 
 ################
 # load json file 
@@ -38,4 +41,14 @@ def load_graph_and_positions(filename):
     with open(filename, 'rb') as file:
         data = pickle.load(file)
     print(f"Graph and positions loaded from {filename}")
-    return data['graph'], data['positions']
\ No newline at end of file
+    return data['graph'], data['positions']
+
+#######################
+# CREATE A PROCESS POOL
+#######################
+
+def create_process_pool(processes, initializer=None, initargs=()):
+    # fork hands grids and graph arrays to the workers without pickling them and keeps the workers from
+    # importing the calling script again. Where fork is unavailable the calling script needs a __main__ guard.
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    return ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=initializer, initargs=initargs)
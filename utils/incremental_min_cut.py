@@ -0,0 +1,133 @@
+import time
+import numpy as np
+from MinCutInstance.min_cut_intsance import MinCutInstance, NORMAL_OUT
+from MinCutInstance.max_flow_backends import get_backend
+from MinCutInstance.graph_reduction import reachable
+from RelevantGridGetter.relevant_grid_getter import RelevantGridGetter
+from utils.compute_min_cut_solution import summarize_min_cut
+
+
+class IncrementalMinCut:
+    """
+    Min cut for a rising water level, warm started from the flow of the previous level.
+
+    Raising the level mostly adds relevant cells and increases in->out capacities, so the previous flow
+    stays feasible in the new network. Every arc keeps its flow, and only the residual network is
+    solved: it is pruned to the nodes on some source -> sink path of positive residual capacity, which
+    are the only nodes additional flow can pass through. Relevant cells per level come from the flood
+    arrival levels, which are computed once.
+
+    The relevant set is not monotone though: a border cell of overlapping basins (river > 1) drops out
+    once the water covers it. If an arc of the previous network is gone or its flow exceeds the new
+    capacity, the level is solved cold, from zero flow.
+
+    The residual problem needs the flow on every arc, so the backend has to implement get_flows
+    (ortools does), other backends are rejected with a ValueError.
+    """
+
+    def __init__(self, grid, building_weight=1, scaling_factor=1e6, backend="ortools"):
+        if not get_backend(backend).reports_flows:
+            raise ValueError(f"The {backend} backend does not report arc flows, which the warm start needs. Use ortools instead")
+        self.grid = grid
+        self.building_weight = building_weight
+        self.scaling_factor = scaling_factor
+        self.backend = backend
+        self.relevant_grid_getter = RelevantGridGetter(grid)
+        self.min_cut_instance = None
+        self.water_height = None
+        self.flow_value = 0
+        # flow on every arc of min_cut_instance and the keys identifying these arcs across levels
+        self.flows = None
+        self.arc_keys = None
+
+    def _arc_keys(self, instance):
+        # Node ids change when cells are added, so arcs are identified by their cells, building ids and terminals
+        n_cells = self.grid.number_of_nodes
+        n_buildings = len(instance.building_ids)
+        node_keys = np.empty(len(instance.node_category), dtype=np.int64)
+        cells = instance.node_cell >= 0
+        node_keys[cells] = 2 * instance.node_cell[cells].astype(np.int64) + (instance.node_category[cells] == NORMAL_OUT)
+        node_keys[instance.building_nodes] = 2 * n_cells + np.arange(n_buildings)
+        node_keys[instance.source] = 2 * n_cells + n_buildings
+        node_keys[instance.sink] = 2 * n_cells + n_buildings + 1
+        n_keys = 2 * n_cells + n_buildings + 2
+        return node_keys[instance.tails] * n_keys + node_keys[instance.heads]
+
+    def _carry_over_flows(self, keys, capacities):
+        # Flow of the previous network on the matching arcs of the new one. Parallel arcs share a key,
+        # their flow goes to the first of them (these are infinite arcs).
+        # None if the previous flow does not fit into the new network.
+        flows = np.zeros(len(keys), dtype=np.int64)
+        if self.flows is None:
+            return flows
+        old_keys, inverse = np.unique(self.arc_keys, return_inverse=True)
+        old_flows = np.zeros(len(old_keys), dtype=np.int64)
+        np.add.at(old_flows, inverse.reshape(-1), self.flows)
+        if not np.all(np.isin(old_keys, keys)):
+            return None
+        new_keys, first = np.unique(keys, return_index=True)
+        flows[first[np.searchsorted(new_keys, old_keys)]] = old_flows
+        if np.any(flows > capacities):
+            return None
+        return flows
+
+    def solve(self, water_height):
+        """
+        Update the min cut for water_height, which must not be lower than the previous one.
+
+        Returns:
+            dict: solution as returned by compute_min_cut_solution
+        """
+        if self.water_height is not None and water_height < self.water_height:
+            raise ValueError(f"Water height {water_height} is below the previous {self.water_height}, solve a new instance instead")
+        start = time.perf_counter()
+        self.relevant_grid_getter.get_relevant_nodes_from_arrival_levels(river_height=water_height, elevation_threshold=0)
+        instance = MinCutInstance(self.grid, building_weight=self.building_weight, scaling_factor=self.scaling_factor)
+        source, sink = instance.build_graph(water_height)
+        n_nodes, n_arcs = len(instance.node_category), len(instance.tails)
+        keys = self._arc_keys(instance)
+        flows = self._carry_over_flows(keys, instance.capacities)
+        if flows is None:
+            print(f"Incremental min cut at {water_height}: the previous flow does not fit the new network, solving from zero flow")
+            flows = np.zeros(n_arcs, dtype=np.int64)
+            self.flow_value = 0
+
+        # Residual network: remaining capacity forward, current flow backward
+        used = np.flatnonzero(flows > 0)
+        residual_tails = np.concatenate([instance.tails, instance.heads[used]])
+        residual_heads = np.concatenate([instance.heads, instance.tails[used]])
+        residual_capacities = np.concatenate([instance.capacities - flows, flows[used]])
+        positive = residual_capacities > 0
+        live = reachable(n_nodes, residual_tails[positive], residual_heads[positive], [source])
+        live &= reachable(n_nodes, residual_heads[positive], residual_tails[positive], [sink])
+
+        added_flow = 0
+        n_live = int(np.count_nonzero(live))
+        if live[sink]:
+            arcs = np.flatnonzero(positive & live[residual_tails] & live[residual_heads])
+            local_id = np.full(n_nodes, -1, dtype=np.int64)
+            local_id[live] = np.arange(n_live)
+            backend = get_backend(self.backend)
+            added_flow, _ = backend.solve(n_live, local_id[residual_tails[arcs]], local_id[residual_heads[arcs]],
+                                          residual_capacities[arcs], local_id[source], local_id[sink])
+            residual_flows = np.zeros(len(residual_tails), dtype=np.int64)
+            residual_flows[arcs] = backend.get_flows()
+            flows += residual_flows[:n_arcs]
+            flows[used] -= residual_flows[n_arcs:]
+
+        # Source side: everything reachable from the source in the residual network of the final flow
+        remaining = instance.capacities - flows
+        arcs_forward = remaining > 0
+        arcs_backward = flows > 0
+        source_side = reachable(n_nodes, np.concatenate([instance.tails[arcs_forward], instance.heads[arcs_backward]]),
+                                 np.concatenate([instance.heads[arcs_forward], instance.tails[arcs_backward]]), [source])
+
+        self.flow_value += added_flow
+        self.flows, self.arc_keys = flows, keys
+        self.min_cut_instance = instance
+        self.water_height = water_height
+        instance.arc_load_time = None
+        instance.solve_time = time.perf_counter() - start
+        print(f"Incremental min cut at {water_height}: {n_live} of {n_nodes} nodes on augmenting paths, "
+              f"flow +{added_flow}, updated in {instance.solve_time:.2f}s")
+        return summarize_min_cut(instance, self.flow_value, source_side)
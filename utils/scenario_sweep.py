@@ -0,0 +1,106 @@
+import time
+from functools import partial
+from MinCutInstance.min_cut_intsance import MinCutInstance
+from MinCutInstance.max_flow_backends import get_backend
+from RelevantGridGetter.relevant_grid_getter import RelevantGridGetter
+from utils.compute_min_cut_solution import summarize_min_cut
+from utils.general_operations import create_process_pool
+from utils.incremental_min_cut import IncrementalMinCut
+
+# Grid of a worker process, inherited from the parent by _init_worker
+_worker_grid = None
+
+
+def _init_worker(grid):
+    global _worker_grid
+    _worker_grid = grid
+
+
+def _solve_level(water_height, building_weight, scaling_factor, backend="ortools", graph_cache=None, reduce=False,
+                 split_components=False, component_processes=1, grid=None):
+    # Cold solve of one water level, in a worker the relevant field is written into the worker's copy of the grid
+    grid = grid if grid is not None else _worker_grid
+    start = time.perf_counter()
+    RelevantGridGetter(grid).get_relevant_nodes_from_arrival_levels(river_height=water_height, elevation_threshold=0)
+    min_cut_instance = MinCutInstance(grid, building_weight=building_weight, scaling_factor=scaling_factor)
+    source, sink = min_cut_instance.build_graph(water_height, cache=graph_cache)
+    flow_value, source_side = min_cut_instance.run_max_flow(source, sink, backend=backend, reduce=reduce,
+                                                            split_components=split_components, processes=component_processes)
+    return summarize_min_cut(min_cut_instance, flow_value, source_side), time.perf_counter() - start
+
+
+def run_scenario_sweep(grid, river_water_level, water_level_increases, building_weight=10, scaling_factor=1e6,
+                       processes=1, backend="ortools", graph_cache=None, reduce=False, split_components=False,
+                       component_processes=1):
+    """
+    Solve the min cut for a ladder of water levels and return one table row per level.
+
+    Level independent work is done once: the grid with rivers and buildings is shared and the flood
+    arrival levels are computed once, so the relevant cells of a level are a threshold. With
+    processes=1 the levels are solved in increasing order with IncrementalMinCut, each one warm started
+    from the flow of the previous level, which needs a backend reporting arc flows (ortools); with any
+    other backend the levels are solved cold in this process. With more processes every
+    level is solved cold on a process pool with any backend, where a GraphCache avoids rebuilding
+    networks solved in earlier sweeps. With processes=1 the relevant field of grid is left at the
+    highest level.
+
+    With reduce or split_components every level is solved cold, also with processes=1, since the
+    warm start needs the flow on every arc of the full network.
+
+    Args:
+        water_level_increases: increases over river_water_level, e.g. np.arange(0.1, 3.05, 0.1)
+        reduce: shrink the network of every level with GraphReduction before solving it
+        split_components: solve the connected components of every network independently
+        component_processes: worker processes for the components of one level
+
+    Returns:
+        list of dict: rows with water_level_increase, water_height, sandbags_needed,
+        number_flooded_buildings, flooded_buildings, number_cut_cells and time, by increasing level
+    """
+    increases = sorted(set(round(float(increase), 6) for increase in water_level_increases))
+    warm_start = processes == 1 and not reduce and not split_components
+    if warm_start and not get_backend(backend).reports_flows:
+        print(f"The {backend} backend does not report arc flows, solving every level cold")
+        warm_start = False
+    if warm_start:
+        incremental_min_cut = IncrementalMinCut(grid, building_weight=building_weight, scaling_factor=scaling_factor, backend=backend)
+    relevant_grid_getter = RelevantGridGetter(grid)
+    relevant_grid_getter.get_flood_arrival_levels()
+
+    rows = []
+    if warm_start:
+        for increase in increases:
+            start = time.perf_counter()
+            solution = incremental_min_cut.solve(river_water_level + increase)
+            rows.append((increase, solution, time.perf_counter() - start))
+    else:
+        solve = partial(_solve_level, building_weight=building_weight, scaling_factor=scaling_factor, backend=backend,
+                        graph_cache=graph_cache, reduce=reduce, split_components=split_components,
+                        component_processes=component_processes)
+        water_heights = [river_water_level + increase for increase in increases]
+        if processes == 1:
+            results = [solve(water_height, grid=grid) for water_height in water_heights]
+        else:
+            with create_process_pool(processes, initializer=_init_worker, initargs=(grid,)) as executor:
+                results = list(executor.map(solve, water_heights))
+        rows = [(increase, solution, elapsed) for increase, (solution, elapsed) in zip(increases, results)]
+
+    table = []
+    for increase, solution, elapsed in rows:
+        table.append({
+            "water_level_increase": increase,
+            "water_height": river_water_level + increase,
+            "sandbags_needed": solution["sandbags_needed"],
+            "number_flooded_buildings": len(solution["flooded_buildings"]),
+            "flooded_buildings": solution["flooded_buildings"],
+            "number_cut_cells": len(solution["cut_cells"]),
+            "time": elapsed,
+        })
+    return table
+
+
+def print_scenario_table(table):
+    print(f"{'increase':>9} {'height':>9} {'sandbags':>10} {'flooded':>8} {'cut cells':>10} {'time':>7}")
+    for row in table:
+        print(f"{row['water_level_increase']:>9.2f} {row['water_height']:>9.2f} {row['sandbags_needed']:>10.2f} "
+              f"{row['number_flooded_buildings']:>8} {row['number_cut_cells']:>10} {row['time']:>6.1f}s")